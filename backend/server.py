@@ -1,43 +1,366 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, BackgroundTasks, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse, StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from fastapi.staticfiles import StaticFiles
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, monitoring
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure, PyMongoError
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, TypeAdapter, ValidationError
+from typing import List, Optional, Literal, Union, get_args
 import uuid
-from datetime import datetime, timezone, timedelta
+import json
+import base64
+import orjson
+from datetime import date, datetime, timezone, timedelta
 from passlib.context import CryptContext
 import jwt
-import shutil
+import hashlib
 import random
+import time
+import csv
+import io
+import re
+import itertools
+import threading
+import multiprocessing
+import contextvars
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+from python_multipart.multipart import MultipartParser, parse_options_header
+from thumbnails import render_thumbnails
+from openpyxl import load_workbook
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# Metrics
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMANDS_PER_REQUEST_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense (``le`` bounds)."""
+    
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+    
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+class RequestStats:
+    """MongoDB work done on behalf of one HTTP request."""
+    __slots__ = ("commands", "seconds", "finished")
+    
+    def __init__(self):
+        self.commands = 0
+        self.seconds = 0.0
+        # Set with the last body chunk; background tasks run afterwards
+        # in the same context and are not the route's work
+        self.finished = False
+
+# Set by MetricsMiddleware; Motor copies the context into its worker threads,
+# so the command listener sees the request it is running for
+current_request_stats = contextvars.ContextVar("current_request_stats", default=None)
+
+class Metrics:
+    """Process-wide request and MongoDB metrics, rendered for ``/metrics``."""
+    
+    def __init__(self):
+        # Command events arrive on Motor's worker threads
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)  # (method, route, status) -> count
+        self.latency = {}  # (method, route) -> Histogram of seconds
+        self.request_commands = {}  # (method, route) -> Histogram of Mongo commands per request
+        self.request_mongo_seconds = defaultdict(float)  # (method, route) -> seconds
+        self.in_flight = defaultdict(int)  # (method, route) -> requests
+        self.commands = defaultdict(int)  # (command, outcome) -> count
+        self.command_seconds = defaultdict(float)  # command -> seconds
+    
+    def observe_command(self, command: str, seconds: float, failed: bool):
+        with self._lock:
+            self.commands[(command, "failed" if failed else "succeeded")] += 1
+            self.command_seconds[command] += seconds
+            stats = current_request_stats.get()
+            if stats is not None and not stats.finished:
+                stats.commands += 1
+                stats.seconds += seconds
+    
+    def request_started(self, method: str, route: str):
+        with self._lock:
+            self.in_flight[(method, route)] += 1
+    
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            self.in_flight[key] -= 1
+            self.requests[(method, route, status_code)] += 1
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.request_commands[key] = Histogram(COMMANDS_PER_REQUEST_BUCKETS)
+            self.latency[key].observe(seconds)
+            self.request_commands[key].observe(stats.commands)
+            self.request_mongo_seconds[key] += stats.seconds
+    
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4."""
+        lines = []
+        
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+        
+        with self._lock:
+            family("http_requests_total", "counter", "HTTP requests by route and status.")
+            for (method, route, status_code), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status_code}"}} {count}')
+            family("http_request_duration_seconds", "histogram", "HTTP request latency until the last body chunk.")
+            for (method, route), histogram in sorted(self.latency.items()):
+                lines.extend(histogram.render("http_request_duration_seconds", f'method="{method}",route="{route}"'))
+            family("http_requests_in_flight", "gauge", "HTTP requests currently being served, including open event streams.")
+            for (method, route), count in sorted(self.in_flight.items()):
+                lines.append(f'http_requests_in_flight{{method="{method}",route="{route}"}} {count}')
+            family("http_request_mongodb_commands", "histogram", "MongoDB commands issued per HTTP request.")
+            for (method, route), histogram in sorted(self.request_commands.items()):
+                lines.extend(histogram.render("http_request_mongodb_commands", f'method="{method}",route="{route}"'))
+            family("http_request_mongodb_seconds_total", "counter", "Time spent in MongoDB commands by route.")
+            for (method, route), seconds in sorted(self.request_mongo_seconds.items()):
+                lines.append(f'http_request_mongodb_seconds_total{{method="{method}",route="{route}"}} {seconds}')
+            family("mongodb_commands_total", "counter", "MongoDB commands by name and outcome.")
+            for (command, outcome), count in sorted(self.commands.items()):
+                lines.append(f'mongodb_commands_total{{command="{command}",outcome="{outcome}"}} {count}')
+            family("mongodb_command_seconds_total", "counter", "Time spent in MongoDB commands by name.")
+            for command, seconds in sorted(self.command_seconds.items()):
+                lines.append(f'mongodb_command_seconds_total{{command="{command}"}} {seconds}')
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        metrics.observe_command(event.command_name, event.duration_micros / 1_000_000, failed=False)
+    
+    def failed(self, event):
+        metrics.observe_command(event.command_name, event.duration_micros / 1_000_000, failed=True)
+
+class MetricsMiddleware:
+    """ASGI middleware recording count, latency and MongoDB usage per route.
+
+    Routes are labelled by their path template (``/api/orders/{order_id}``)
+    so metric cardinality stays bounded.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    @staticmethod
+    def route_label(scope) -> str:
+        # Resolved before the app runs so in-flight requests carry the
+        # route too; the router picks a full match over a partial one
+        partial = None
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                partial = route.path
+        return partial or "unmatched"
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        label = self.route_label(scope)
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status_code = 500
+        finished = None
+        started = time.perf_counter()
+        
+        async def send_with_metrics(message):
+            nonlocal status_code, finished
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                # Background tasks run after this; keep them out of the latency
+                # and the route's MongoDB usage
+                finished = time.perf_counter()
+                stats.finished = True
+            await send(message)
+        
+        metrics.request_started(method, label)
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            current_request_stats.reset(token)
+            metrics.observe_request(method, label, status_code, (finished or time.perf_counter()) - started, stats)
+
+# MongoDB connection. Pool bounds and timeouts are tunable per deployment;
+# minPoolSize connections are opened during startup, before traffic arrives.
+# A zero socket or wait queue timeout means no limit.
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 10))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 0))
+
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS or None,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+    event_listeners=[MongoCommandMetrics()]
+)
 db = client[os.environ['DB_NAME']]
 
+# Readiness probe: how long a DB ping may take before the worker reports unready
+HEALTH_PING_TIMEOUT_SECONDS = float(os.environ.get('HEALTH_PING_TIMEOUT_SECONDS', 2))
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 64))
 
 # JWT settings
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+# Stream tokens end up in URLs (EventSource cannot send headers), so they
+# only open /api/events and expire quickly
+EVENTS_TOKEN_EXPIRE_SECONDS = int(os.environ.get('EVENTS_TOKEN_EXPIRE_SECONDS', 60))
+
+# Authenticated user cache settings
+USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', 10000))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+
+# Pagination settings
+MAX_PAGE_SIZE = 1000
+
+# List serialization: "off" (FastAPI default), "validate" (one pydantic pass
+# per list, serialized in Rust) or "trusted" (DB output dumped with orjson)
+FAST_RESPONSES = os.environ.get('FAST_RESPONSES', 'off')
+
+# Bulk import settings
+BULK_CHUNK_SIZE = 1000
+
+# Export settings: documents fetched per cursor batch and sent per chunk
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+
+# Change events: "auto" uses Mongo change streams when connected to a replica
+# set, "local" only publishes writes made by this process
+EVENTS_SOURCE = os.environ.get('EVENTS_SOURCE', 'auto')
+EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 100))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+
+# Denormalized client fields in orders: orders rewritten per update_many and
+# attempts before a propagation is left to the consistency checker
+PROPAGATION_BATCH_SIZE = int(os.environ.get('PROPAGATION_BATCH_SIZE', 1000))
+PROPAGATION_RETRIES = max(1, int(os.environ.get('PROPAGATION_RETRIES', 5)))
+
+# Search settings: candidates ranked per collection before the best are returned
+SEARCH_CANDIDATES = int(os.environ.get('SEARCH_CANDIDATES', 200))
+
+# Schema migrations: how long a runner may hold the migrations lock and the
+# daily stats rebuild lock before another worker takes over
+MIGRATIONS_LOCK_SECONDS = int(os.environ.get('MIGRATIONS_LOCK_SECONDS', 600))
+DAILY_STATS_REBUILD_LOCK_SECONDS = int(os.environ.get('DAILY_STATS_REBUILD_LOCK_SECONDS', 600))
+LOCK_POLL_SECONDS = 1.0
+
+# Cost cache settings
+COST_CACHE_MAX_ENTRIES = int(os.environ.get('COST_CACHE_MAX_ENTRIES', 50000))
 
 # Create uploads directory
 UPLOADS_DIR = ROOT_DIR / 'uploads'
 UPLOADS_DIR.mkdir(exist_ok=True)
 
+# Upload settings
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 10 * 1024 * 1024))  # 10 MB
+# Room for the multipart boundaries and part headers around the file
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+THUMBNAIL_SIZES = (200, 400)
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Lifespan
+async def warm_up():
+    """Get a worker ready before it reports ready: open the minimum pool
+    connections concurrently, apply pending migrations (indexes) and build
+    the list serializers used by the hot list endpoints."""
+    await asyncio.gather(*(db.command("ping") for _ in range(max(1, MONGO_MIN_POOL_SIZE))))
+    await run_migrations(db)
+    for model in (Order, Client, ClientWithStats, Ingredient, Recipe, Semifinished, Category):
+        list_adapter(model)
+
+async def is_replica_set(database) -> bool:
+    hello = await database.client.admin.command("hello")
+    return "setName" in hello
+
+async def start_change_stream() -> Optional[asyncio.Task]:
+    if EVENTS_SOURCE == "local":
+        return None
+    if not await is_replica_set(db):
+        logger.info("MongoDB is not a replica set, publishing change events in-process only")
+        return None
+    return asyncio.create_task(watch_changes(db))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # Spawned, not forked: this process already runs driver and pool threads
+    app.state.thumbnail_executor = ProcessPoolExecutor(
+        max_workers=THUMBNAIL_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    await warm_up()
+    change_stream_task = await start_change_stream()
+    app.state.ready = True
+    logger.info("Worker ready in %.0f ms", (time.perf_counter() - started) * 1000)
+    try:
+        yield
+    finally:
+        # Fail readiness first so the load balancer drains this worker
+        app.state.ready = False
+        if change_stream_task is not None:
+            change_stream_task.cancel()
+        client.close()
+        password_hasher.shutdown()
+        app.state.thumbnail_executor.shutdown(wait=False)
+
 # Create the main app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files
 app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
@@ -46,6 +369,7 @@ app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
 api_router = APIRouter(prefix="/api")
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # Models
 class User(BaseModel):
@@ -92,11 +416,22 @@ class Client(BaseModel):
     phone: Optional[str] = None
     createdAt: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
+class ClientWithStats(Client):
+    orderCount: int
+    lifetimeValue: float
+    lastOrderDate: Optional[str] = None
+    openOrders: int
+
 class ClientCreate(BaseModel):
     name: str
     email: Optional[str] = None
     phone: Optional[str] = None
 
+class ClientUpdate(BaseModel):
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+
 class Ingredient(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -110,6 +445,11 @@ class IngredientCreate(BaseModel):
     unit: str
     price: float
 
+class IngredientUpdate(BaseModel):
+    name: Optional[str] = None
+    unit: Optional[str] = None
+    price: Optional[float] = None
+
 class RecipeIngredient(BaseModel):
     ingredientId: str
     quantity: float
@@ -126,21 +466,40 @@ class Recipe(BaseModel):
     name: str
     categoryId: Optional[str] = None
     imageUrl: Optional[str] = None
+    thumbnailUrl: Optional[str] = None
     description: str = ""
     laborCost: float = 0
     markup: float = 0
     ingredients: List[RecipeIngredient] = []
     components: List[RecipeComponent] = []
+    recipeCost: Optional[float] = None
+    totalCost: Optional[float] = None
+    finalPrice: Optional[float] = None
 
 class RecipeCreate(BaseModel):
     name: str
     categoryId: Optional[str] = None
+    imageUrl: Optional[str] = None
+    thumbnailUrl: Optional[str] = None
     description: Optional[str] = ""
     laborCost: float = 0
     markup: float = 0
     ingredients: List[RecipeIngredient] = []
     components: List[RecipeComponent] = []
 
+class RecipeUpdate(BaseModel):
+    name: Optional[str] = None
+    categoryId: Optional[str] = None
+    imageUrl: Optional[str] = None
+    thumbnailUrl: Optional[str] = None
+    description: Optional[str] = None
+    laborCost: Optional[float] = None
+    markup: Optional[float] = None
+    ingredients: Optional[List[RecipeIngredient]] = None
+    components: Optional[List[RecipeComponent]] = None
+
+RECIPE_IMAGE_FIELDS = ("imageUrl", "thumbnailUrl")
+
 class Semifinished(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -149,12 +508,25 @@ class Semifinished(BaseModel):
     unit: str
     laborCost: float = 0
     ingredients: List[RecipeIngredient] = []
+    # Nested semifinished products (and ingredients), as in recipes
+    components: List[RecipeComponent] = []
+    ingredientsCost: Optional[float] = None
+    totalCost: Optional[float] = None
+    finalPrice: Optional[float] = None
 
 class SemifinishedCreate(BaseModel):
     name: str
     unit: str
     laborCost: float = 0
     ingredients: List[RecipeIngredient] = []
+    components: List[RecipeComponent] = []
+
+class OrderLine(BaseModel):
+    recipeId: str
+    quantity: float = Field(1, gt=0)
+
+OrderStatus = Literal["New", "In Progress", "Ready", "Delivered", "Cancelled"]
+ORDER_STATUSES = get_args(OrderStatus)
 
 class Order(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -163,6 +535,7 @@ class Order(BaseModel):
     clientId: str
     client: dict
     item: str
+    lines: List[OrderLine] = []
     dueDate: str
     total: float
     status: str = "New"
@@ -172,18 +545,30 @@ class Order(BaseModel):
 class OrderCreate(BaseModel):
     clientId: str
     item: str
+    lines: List[OrderLine] = []
     dueDate: str
     total: float
     notes: Optional[str] = ""
 
 class OrderUpdate(BaseModel):
-    status: Optional[str] = None
+    status: Optional[OrderStatus] = None
     clientId: Optional[str] = None
     item: Optional[str] = None
+    lines: Optional[List[OrderLine]] = None
     dueDate: Optional[str] = None
     total: Optional[float] = None
     notes: Optional[str] = None
 
+class RecipeCostItem(BaseModel):
+    recipeId: str
+    quantity: float = 1
+
+class RecipeCostRequest(BaseModel):
+    items: List[RecipeCostItem]
+
+class BulkUpsertRequest(BaseModel):
+    items: List[dict]
+
 class PasswordResetRequest(BaseModel):
     email: EmailStr
 
@@ -204,11 +589,183 @@ class CategoryCreate(BaseModel):
     color: Optional[str] = "#3B82F6"
 
 # Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool so hashing never blocks the
+    event loop. At most ``max_pending`` calls may be queued or running;
+    beyond that requests fail fast with 503 instead of piling up."""
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self.pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+    
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server is busy, please try again", headers={"Retry-After": "1"})
+        
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.pending -= 1
+            self.calls += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+    
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "avgMs": self.total_seconds / self.calls * 1000 if self.calls else 0,
+            "maxMs": self.max_seconds * 1000
+        }
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+class MultipartFileReceiver:
+    """Callbacks for ``python_multipart``'s streaming parser that pick the
+    data of one file field out of a multipart/form-data body."""
+    
+    def __init__(self, field: str):
+        self.field = field.encode()
+        self.filename = None
+        self.chunks = []
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._receiving = False
+    
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field_data,
+            "on_header_value": self._header_value_data,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+    
+    def take(self) -> bytes:
+        """File data parsed since the last call."""
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+    
+    def _part_begin(self):
+        self._headers = {}
+    
+    def _header_field_data(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+    
+    def _header_value_data(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+    
+    def _header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+    
+    def _headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Only the first part with the field name is stored
+        self._receiving = options.get(b"name") == self.field and self.filename is None
+        if self._receiving:
+            self.filename = options.get(b"filename", b"").decode("utf-8", "replace")
+    
+    def _part_data(self, data: bytes, start: int, end: int):
+        if self._receiving:
+            self.chunks.append(data[start:end])
+    
+    def _part_end(self):
+        self._receiving = False
+
+# Request body schema for the upload routes, which read the body themselves
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"],
+        }}},
+    }
+}
+
+async def store_upload(request: Request, field: str = "file") -> str:
+    """Stream the ``field`` file of a multipart/form-data request to
+    ``UPLOADS_DIR`` and name it by its SHA-256 digest, so identical files
+    are stored once. Returns the stored filename.
+
+    The body is parsed from ``request.stream()`` as it arrives: an
+    ``UploadFile`` parameter would have Starlette spool all of it to a
+    temporary file before the route runs. A body declaring more than
+    ``UPLOAD_MAX_BYTES`` is refused before any of it is read, and one that
+    carries more is cut off as soon as it does.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    too_large = HTTPException(status_code=413, detail=f"File is larger than {UPLOAD_MAX_BYTES} bytes")
+    max_body = UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD_BYTES
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_body:
+        raise too_large
+    
+    receiver = MultipartFileReceiver(field)
+    parser = MultipartParser(boundary, receiver.callbacks())
+    temp_path = UPLOADS_DIR / f".upload-{uuid.uuid4()}"
+    digest = hashlib.sha256()
+    received = 0
+    size = 0
+    
+    buffer = await asyncio.to_thread(open, temp_path, "wb")
+    try:
+        async for body in request.stream():
+            received += len(body)
+            if received > max_body:
+                raise too_large
+            parser.write(body)
+            chunk = receiver.take()
+            if chunk:
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise too_large
+                digest.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+        parser.finalize()
+        if receiver.filename is None:
+            raise HTTPException(status_code=400, detail=f"Missing file field '{field}'")
+    except BaseException:
+        await asyncio.to_thread(buffer.close)
+        temp_path.unlink(missing_ok=True)
+        raise
+    await asyncio.to_thread(buffer.close)
+    
+    extension = "".join(c for c in Path(receiver.filename).suffix.lower() if c.isalnum())[:10] or "bin"
+    filename = f"{digest.hexdigest()}.{extension}"
+    target = UPLOADS_DIR / filename
+    if target.exists():
+        temp_path.unlink()
+    else:
+        await asyncio.to_thread(os.replace, temp_path, target)
+    return filename
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def hash_password(password: str) -> str:
+    return await password_hasher.run(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(pwd_context.verify, plain_password, hashed_password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -217,23 +774,1140 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+class UserCache:
+    """Bounded TTL/LRU cache of authenticated users keyed by user id, so
+    ``get_current_user`` can skip the ``users`` lookup on most requests.
+    Writes to a user must call ``invalidate``; the TTL bounds staleness
+    across worker processes."""
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+    
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, user: User):
+        self._entries[user.id] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+    
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+user_cache = UserCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+
+def create_events_token(user_id: str) -> str:
+    expire = datetime.now(timezone.utc) + timedelta(seconds=EVENTS_TOKEN_EXPIRE_SECONDS)
+    return jwt.encode({"sub": user_id, "scope": "events", "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+async def get_token_user(token: str, scope: Optional[str] = None) -> User:
+    """Resolve a JWT to its user. Session tokens carry no scope; a scoped
+    token is only accepted where that scope is asked for."""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("scope") != scope:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
         
+        cached_user = user_cache.get(user_id)
+        if cached_user is not None:
+            return cached_user
+        
         user = await db.users.find_one({"id": user_id}, {"_id": 0})
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
-        return User(**user)
+        user_obj = User(**user)
+        user_cache.set(user_obj)
+        return user_obj
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await get_token_user(credentials.credentials)
+
+async def get_event_user(
+    token: Optional[str] = Query(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    # Browsers' EventSource cannot send headers, so also accept a short-lived
+    # stream token from POST /events/token as ?token=, never the session JWT
+    if credentials:
+        return await get_token_user(credentials.credentials)
+    if not token:
+        raise HTTPException(status_code=403, detail="Not authenticated")
+    return await get_token_user(token, scope="events")
+
+# Pagination
+def encode_cursor(sort_value, document_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, document_id]).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        sort_value, document_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Both values go into the query as-is; an object would act as an operator
+    if isinstance(sort_value, bool) or not isinstance(sort_value, (str, int, float, type(None))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(document_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, document_id
+
+async def find_page(collection, query: dict, sort: str, order: str, limit: Optional[int], cursor: Optional[str], response: Response) -> List[dict]:
+    """Run ``query`` sorted by ``(sort, id)`` in Mongo.
+
+    Without ``limit`` the whole result is returned. With ``limit`` one keyset
+    page is returned and, if more documents follow, an opaque cursor for the
+    next page is sent in the ``X-Next-Cursor`` header.
+    """
+    direction = -1 if order == "desc" else 1
+    if cursor:
+        sort_value, document_id = decode_cursor(cursor)
+        comparison = "$lt" if direction == -1 else "$gt"
+        query = {
+            **query,
+            "$or": [
+                {sort: {comparison: sort_value}},
+                {sort: sort_value, "id": {comparison: document_id}}
+            ]
+        }
+    
+    documents = collection.find(query, {"_id": 0, "searchKeys": 0}).sort([(sort, direction), ("id", direction)])
+    if limit is None:
+        return await documents.to_list(None)
+    
+    page = await documents.limit(limit + 1).to_list(limit + 1)
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(page[-1].get(sort), page[-1]["id"])
+    return page
+
+def date_range_query(date_from: Optional[str], date_to: Optional[str]) -> dict:
+    """Range condition on ISO date strings; a date-only ``to`` includes that whole day."""
+    condition = {}
+    if date_from:
+        condition["$gte"] = date_from
+    if date_to:
+        if len(date_to) == 10:
+            try:
+                condition["$lt"] = (date.fromisoformat(date_to) + timedelta(days=1)).isoformat()
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid date")
+        else:
+            condition["$lte"] = date_to
+    return condition
+
+# Collection versions
+async def bump_collection_version(user_id: str, collection: str):
+    """Record a write to one of the user's collections; list ETags change with it."""
+    await db.collection_versions.update_one(
+        {"userId": user_id, "collection": collection},
+        {"$inc": {"version": 1}},
+        upsert=True
+    )
+
+async def check_not_modified(request: Request, response: Response, user_id: str, *collections: str) -> Optional[Response]:
+    """Set a strong ``ETag`` for a list endpoint from the user, the versions
+    of the collections it reads and the query string. Returns a 304 response when
+    the client already holds it, so the collections are never queried."""
+    versions = {
+        record["collection"]: record["version"]
+        async for record in db.collection_versions.find(
+            {"userId": user_id, "collection": {"$in": list(collections)}},
+            {"_id": 0, "collection": 1, "version": 1}
+        )
+    }
+    # Versions are per user, so the user is part of the tag: another account
+    # at the same versions must never revalidate this one's cached list
+    query = hashlib.sha256(f"{user_id}:{FAST_RESPONSES}?{request.url.query}".encode()).hexdigest()[:16]
+    etag = '"{}-{}-{}"'.format(
+        ".".join(collections),
+        ".".join(str(versions.get(collection, 0)) for collection in collections),
+        query
+    )
+    
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    response.headers.update(headers)
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return None
+
+# Change events
+class EventHub:
+    """In-process pub/sub fanning change events out to each user's open
+    ``/api/events`` streams.
+
+    Every stream gets a bounded queue; when a slow client falls
+    ``queue_size`` events behind, its backlog is replaced by a single
+    ``resync`` event telling it to refetch.
+    """
+    
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        # Set while a change stream delivers events for writes from every process
+        self.external = False
+        self.published = 0
+        self._subscribers = defaultdict(set)
+    
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers[user_id].add(queue)
+        return queue
+    
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(user_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[user_id]
+    
+    def publish(self, user_id: str, event: dict):
+        self.published += 1
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"action": "resync"})
+            else:
+                queue.put_nowait(event)
+    
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "source": "change_stream" if self.external else "local",
+        }
+
+event_hub = EventHub(EVENTS_QUEUE_SIZE)
+
+def change_event(collection: str, action: str, document: Optional[dict] = None, ids: Optional[List[str]] = None) -> dict:
+    event = {"collection": collection, "action": action}
+    if document is not None:
+        event["id"] = document["id"]
+        if action != "deleted":
+            event["document"] = {key: value for key, value in document.items() if key != "_id"}
+    if ids is not None:
+        event["ids"] = ids
+    return event
+
+def publish_change(user_id: str, collection: str, action: str, document: Optional[dict] = None, ids: Optional[List[str]] = None):
+    """Publish a write made by this process. Skipped while a change stream
+    is running, since it reports the same write from the database, except
+    for deletes: the stream can only attribute those when pre-images are
+    enabled. A delete reported twice is harmless to clients."""
+    if not event_hub.external or action == "deleted":
+        event_hub.publish(user_id, change_event(collection, action, document, ids))
+
+EVENT_COLLECTIONS = ["orders", "clients", "ingredients", "recipes", "categories", "semifinished"]
+
+async def watch_changes(database):
+    """Publish writes from every app process via a Mongo change stream,
+    resuming after errors. Delete events need pre-images
+    (``changeStreamPreAndPostImages``) to be attributed to a user; without
+    them only the deleting process reports the delete, via
+    ``publish_change``."""
+    pipeline = [{"$match": {
+        "ns.coll": {"$in": EVENT_COLLECTIONS},
+        "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+    }}]
+    resume_token = None
+    while True:
+        try:
+            async with database.watch(
+                pipeline,
+                full_document="updateLookup",
+                full_document_before_change="whenAvailable",
+                resume_after=resume_token
+            ) as stream:
+                event_hub.external = True
+                async for change in stream:
+                    resume_token = change["_id"]
+                    document = change.get("fullDocument") or change.get("fullDocumentBeforeChange")
+                    if not document or "userId" not in document:
+                        continue
+                    action = {"insert": "created", "delete": "deleted"}.get(change["operationType"], "updated")
+                    event_hub.publish(document["userId"], change_event(change["ns"]["coll"], action, document))
+        except PyMongoError as error:
+            logger.warning("Change stream interrupted, retrying: %s", error)
+        finally:
+            # However the stream ended, this process must publish its own writes again
+            event_hub.external = False
+        await asyncio.sleep(5)
+
+# List serialization
+@lru_cache(maxsize=None)
+def list_adapter(model) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+def list_response(documents: List[dict], model, response: Response, mode: Optional[str] = None):
+    """Serialize a list endpoint result according to ``FAST_RESPONSES``.
+
+    Both fast modes return a ready ``Response``, bypassing FastAPI's
+    per-item ``response_model`` validation and ``jsonable_encoder`` pass.
+    Headers set on the injected ``response`` are carried over.
+    """
+    mode = mode or FAST_RESPONSES
+    if mode == "validate":
+        adapter = list_adapter(model)
+        fast_response = Response(adapter.dump_json(adapter.validate_python(documents)), media_type="application/json")
+    elif mode == "trusted":
+        fast_response = ORJSONResponse(documents)
+    else:
+        return documents
+    
+    for name, value in response.headers.items():
+        if name != "content-length":
+            fast_response.headers[name] = value
+    return fast_response
+
+# Cost calculation
+async def load_cost_catalog(user_id: str, recipes: List[dict], semifinished_items: Optional[List[dict]] = None):
+    """Fetch every ingredient price and semifinished product referenced by the
+    given recipes and semifinished items with batched ``$in`` queries, instead
+    of one ``find_one`` per line item. Nested semifinished products are
+    loaded one level per query.
+
+    Returns ``(prices, semifinished)`` where ``prices`` maps ingredient id to
+    price and ``semifinished`` maps semifinished id to its document.
+    """
+    semifinished = {item["id"]: item for item in semifinished_items or []}
+    
+    pending = {
+        component["itemId"]
+        for document in [*recipes, *semifinished.values()]
+        for component in document.get("components", [])
+        if component["type"] == "semifinished"
+    } - semifinished.keys()
+    while pending:
+        found = await db.semifinished.find(
+            {"id": {"$in": list(pending)}, "userId": user_id},
+            {"_id": 0}
+        ).to_list(None)
+        for item in found:
+            semifinished[item["id"]] = item
+        pending = {child for item in found for child in semifinished_children(item)} - semifinished.keys()
+    
+    ingredient_ids = set()
+    for document in [*recipes, *semifinished.values()]:
+        ingredient_ids.update(ing["ingredientId"] for ing in document.get("ingredients", []))
+        ingredient_ids.update(
+            component["itemId"]
+            for component in document.get("components", [])
+            if component["type"] == "ingredient"
+        )
+    
+    prices = {}
+    if ingredient_ids:
+        async for ingredient in db.ingredients.find(
+            {"id": {"$in": list(ingredient_ids)}, "userId": user_id},
+            {"_id": 0, "id": 1, "price": 1}
+        ):
+            prices[ingredient["id"]] = ingredient["price"]
+    
+    return prices, semifinished
+
+def semifinished_children(item: dict) -> List[str]:
+    return [component["itemId"] for component in item.get("components", []) if component["type"] == "semifinished"]
+
+def topological_order(semifinished: dict):
+    """Order semifinished ids so each product comes after the products it
+    contains (Kahn's algorithm, O(V + E)). Children missing from
+    ``semifinished`` are ignored.
+
+    Returns ``(order, cyclic)``; ``cyclic`` lists the products that could not
+    be ordered because they sit on or above a cycle.
+    """
+    waiting = {}
+    parents = defaultdict(list)
+    for item_id, item in semifinished.items():
+        children = {child for child in semifinished_children(item) if child in semifinished}
+        waiting[item_id] = len(children)
+        for child in children:
+            parents[child].append(item_id)
+    
+    ready = [item_id for item_id, count in waiting.items() if count == 0]
+    order = []
+    while ready:
+        item_id = ready.pop()
+        order.append(item_id)
+        for parent in parents[item_id]:
+            waiting[parent] -= 1
+            if waiting[parent] == 0:
+                ready.append(parent)
+    
+    ordered = set(order)
+    return order, [item_id for item_id in semifinished if item_id not in ordered]
+
+def compute_semifinished_cost(item: dict, prices: dict, semifinished_costs: dict) -> dict:
+    """Cost of one semifinished product; ``semifinished_costs`` must already
+    hold the costs of the products it contains."""
+    ingredients_cost = sum(
+        prices[ing["ingredientId"]] * ing["quantity"]
+        for ing in item.get("ingredients", [])
+        if ing["ingredientId"] in prices
+    )
+    for component in item.get("components", []):
+        if component["type"] == "ingredient":
+            if component["itemId"] in prices:
+                ingredients_cost += prices[component["itemId"]] * component["quantity"]
+        elif component["itemId"] in semifinished_costs:
+            ingredients_cost += semifinished_costs[component["itemId"]]["totalCost"] * component["quantity"]
+    labor_cost = item.get("laborCost", 0)
+    
+    return {
+        "ingredientsCost": ingredients_cost,
+        "laborCost": labor_cost,
+        "totalCost": ingredients_cost + labor_cost,
+        "finalPrice": ingredients_cost + labor_cost
+    }
+
+def compute_semifinished_costs(semifinished: dict, prices: dict) -> dict:
+    """Cost every product in ``semifinished`` exactly once, contained products
+    first, so shared and deeply nested products are never recomputed."""
+    order, cyclic = topological_order(semifinished)
+    if cyclic:
+        # Rejected on write; cost the rest and leave the loop's inner parts out
+        logger.warning("Semifinished products form a cycle: %s", ", ".join(cyclic))
+    costs = {}
+    for item_id in order + cyclic:
+        costs[item_id] = compute_semifinished_cost(semifinished[item_id], prices, costs)
+    return costs
+
+def compute_recipe_cost(recipe: dict, prices: dict, semifinished_costs: dict) -> dict:
+    # Old ingredients format (backward compatibility)
+    total_cost = sum(
+        prices[ing["ingredientId"]] * ing["quantity"]
+        for ing in recipe.get("ingredients", [])
+        if ing["ingredientId"] in prices
+    )
+    
+    # New components format
+    for component in recipe.get("components", []):
+        if component["type"] == "ingredient":
+            if component["itemId"] in prices:
+                total_cost += prices[component["itemId"]] * component["quantity"]
+        elif component["type"] == "semifinished":
+            cost = semifinished_costs.get(component["itemId"])
+            if cost:
+                total_cost += cost["totalCost"] * component["quantity"]
+    
+    labor_cost = recipe.get("laborCost", 0)
+    markup = recipe.get("markup", 0)
+    
+    final_price = (total_cost + labor_cost) * (1 + markup / 100)
+    
+    return {
+        "recipeCost": total_cost,
+        "laborCost": labor_cost,
+        "totalCost": total_cost + labor_cost,
+        "markup": markup,
+        "finalPrice": final_price
+    }
+
+# Materialized costs
+RECIPE_COST_FIELDS = ("recipeCost", "totalCost", "finalPrice")
+SEMIFINISHED_COST_FIELDS = ("ingredientsCost", "totalCost", "finalPrice")
+
+def materialized_costs(cost: dict, fields: tuple) -> dict:
+    return {field: cost[field] for field in fields}
+
+async def store_materialized_costs(collection, user_id: str, costs: dict, fields: tuple):
+    """Write ``{document_id: cost}`` back onto the documents with one ``bulk_write``."""
+    if not costs:
+        return
+    await collection.bulk_write(
+        [
+            UpdateOne({"id": document_id, "userId": user_id}, {"$set": materialized_costs(cost, fields)})
+            for document_id, cost in costs.items()
+        ],
+        ordered=False
+    )
+
+async def refresh_materialized_costs(user_id: str, ingredient_ids: Optional[List[str]] = None, semifinished_ids: Optional[List[str]] = None):
+    """Recompute the stored costs of every semifinished product and recipe that
+    uses the given ingredients or semifinished products.
+
+    Dependents are found through the ``ingredients.ingredientId`` and
+    ``components.itemId`` multikey fields (ingredient -> semifinished ->
+    containing semifinished -> recipes), so only affected documents are
+    loaded and rewritten.
+    """
+    ingredient_ids = list(ingredient_ids or [])
+    changed_ids = list(semifinished_ids or [])
+    
+    # Products using the ingredients or changed products, then every product
+    # containing one of those, one level per query
+    semifinished = {}
+    found = []
+    if ingredient_ids or changed_ids:
+        found = await db.semifinished.find(
+            {
+                "userId": user_id,
+                "$or": [
+                    {"ingredients.ingredientId": {"$in": ingredient_ids}},
+                    {"components.itemId": {"$in": ingredient_ids + changed_ids}}
+                ]
+            },
+            {"_id": 0}
+        ).to_list(None)
+    while found:
+        for item in found:
+            semifinished[item["id"]] = item
+        containers = await db.semifinished.find(
+            {"userId": user_id, "components.itemId": {"$in": [item["id"] for item in found]}},
+            {"_id": 0}
+        ).to_list(None)
+        found = [item for item in containers if item["id"] not in semifinished]
+    
+    dependency_ids = ingredient_ids + changed_ids + list(semifinished)
+    recipes = await db.recipes.find(
+        {
+            "userId": user_id,
+            "$or": [
+                {"ingredients.ingredientId": {"$in": ingredient_ids}},
+                {"components.itemId": {"$in": dependency_ids}}
+            ]
+        },
+        {"_id": 0}
+    ).to_list(None)
+    
+    prices, catalog = await load_cost_catalog(user_id, recipes, list(semifinished.values()))
+    semifinished_costs = compute_semifinished_costs(catalog, prices)
+    if semifinished:
+        await store_materialized_costs(
+            db.semifinished,
+            user_id,
+            {item_id: semifinished_costs[item_id] for item_id in semifinished},
+            SEMIFINISHED_COST_FIELDS
+        )
+        await bump_collection_version(user_id, "semifinished")
+        publish_change(user_id, "semifinished", "refreshed", ids=list(semifinished))
+    if recipes:
+        await store_materialized_costs(
+            db.recipes,
+            user_id,
+            {recipe["id"]: compute_recipe_cost(recipe, prices, semifinished_costs) for recipe in recipes},
+            RECIPE_COST_FIELDS
+        )
+        await bump_collection_version(user_id, "recipes")
+        publish_change(user_id, "recipes", "refreshed", ids=[recipe["id"] for recipe in recipes])
+
+async def backfill_recipe_costs(user_id: str, recipes: List[dict]):
+    """Fill in and store costs of recipes saved before costs were materialized."""
+    stale_ids = [recipe["id"] for recipe in recipes if recipe.get("finalPrice") is None]
+    if not stale_ids:
+        return
+    costs = await get_recipe_costs(user_id, stale_ids)
+    await store_materialized_costs(db.recipes, user_id, costs, RECIPE_COST_FIELDS)
+    for recipe in recipes:
+        if recipe["id"] in costs:
+            recipe.update(materialized_costs(costs[recipe["id"]], RECIPE_COST_FIELDS))
+
+async def backfill_semifinished_costs(user_id: str, items: List[dict]):
+    """Fill in and store costs of semifinished products saved before costs were materialized."""
+    stale = [item for item in items if item.get("finalPrice") is None]
+    if not stale:
+        return
+    prices, catalog = await load_cost_catalog(user_id, [], stale)
+    semifinished_costs = compute_semifinished_costs(catalog, prices)
+    costs = {item["id"]: semifinished_costs[item["id"]] for item in stale}
+    await store_materialized_costs(db.semifinished, user_id, costs, SEMIFINISHED_COST_FIELDS)
+    for item in stale:
+        item.update(materialized_costs(costs[item["id"]], SEMIFINISHED_COST_FIELDS))
+
+# Cost cache
+class UserCostGraph:
+    """Memoized semifinished and recipe costs of one user.
+
+    Every cached node remembers the nodes it was computed from, so a change
+    to an ingredient, semifinished product or recipe drops only the costs
+    that depend on it. ``versions`` holds the user's collection versions the
+    costs were computed at; writes made by other workers only show there.
+    """
+    def __init__(self):
+        self.costs = {}
+        self.dependencies = {}
+        self.dependents = defaultdict(set)
+        self.generation = 0
+        self.versions = None
+    
+    def reset(self, versions: tuple):
+        self.generation += 1
+        self.costs.clear()
+        self.dependencies.clear()
+        self.dependents.clear()
+        self.versions = versions
+    
+    def get(self, node):
+        return self.costs.get(node)
+    
+    def store(self, node, cost: dict, dependencies: set):
+        self._drop(node)
+        self.costs[node] = cost
+        self.dependencies[node] = dependencies
+        for dependency in dependencies:
+            self.dependents[dependency].add(node)
+    
+    def invalidate(self, node):
+        self.generation += 1
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            pending.extend(self.dependents.pop(current, ()))
+            self._drop(current)
+    
+    def _drop(self, node):
+        self.costs.pop(node, None)
+        for dependency in self.dependencies.pop(node, ()):
+            dependents = self.dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(node)
+                if not dependents:
+                    del self.dependents[dependency]
+
+class CostCache:
+    """In-process cost cache keyed by user, bounded to ``max_entries`` cached
+    costs in total. The least recently used users are evicted first."""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._users = OrderedDict()
+    
+    def graph(self, user_id: str) -> UserCostGraph:
+        graph = self._users.get(user_id)
+        if graph is None:
+            graph = self._users[user_id] = UserCostGraph()
+        self._users.move_to_end(user_id)
+        return graph
+    
+    def invalidate(self, user_id: str, node_type: str, node_id: str):
+        graph = self._users.get(user_id)
+        if graph is not None:
+            graph.invalidate((node_type, node_id))
+    
+    def evict(self):
+        total = sum(len(graph.costs) for graph in self._users.values())
+        while total > self.max_entries and len(self._users) > 1:
+            _, graph = self._users.popitem(last=False)
+            total -= len(graph.costs)
+
+cost_cache = CostCache(COST_CACHE_MAX_ENTRIES)
+
+# Collections whose writes can change a cost
+COST_COLLECTIONS = ("ingredients", "semifinished", "recipes")
+
+async def get_cost_graph(user_id: str) -> UserCostGraph:
+    """The user's cost graph, emptied first when the user's ingredients,
+    semifinished products or recipes were written since it was filled,
+    whichever worker made the write."""
+    versions = {
+        record["collection"]: record["version"]
+        async for record in db.collection_versions.find(
+            {"userId": user_id, "collection": {"$in": list(COST_COLLECTIONS)}},
+            {"_id": 0, "collection": 1, "version": 1}
+        )
+    }
+    versions = tuple(versions.get(collection, 0) for collection in COST_COLLECTIONS)
+    graph = cost_cache.graph(user_id)
+    if graph.versions != versions:
+        graph.reset(versions)
+    return graph
+
+def recipe_dependencies(recipe: dict) -> set:
+    dependencies = {("ingredient", ing["ingredientId"]) for ing in recipe.get("ingredients", [])}
+    dependencies.update((component["type"], component["itemId"]) for component in recipe.get("components", []))
+    return dependencies
+
+def semifinished_dependencies(item: dict) -> set:
+    dependencies = {("ingredient", ing["ingredientId"]) for ing in item.get("ingredients", [])}
+    dependencies.update((component["type"], component["itemId"]) for component in item.get("components", []))
+    return dependencies
+
+async def get_recipe_costs(user_id: str, recipe_ids: List[str]) -> dict:
+    """Return ``{recipe_id: cost}`` for the user's recipes, serving cached
+    costs from memory and computing the rest with one catalog load.
+    Unknown recipe ids are left out of the result."""
+    graph = await get_cost_graph(user_id)
+    costs = {}
+    missing = []
+    for recipe_id in dict.fromkeys(recipe_ids):
+        cost = graph.get(("recipe", recipe_id))
+        if cost is not None:
+            costs[recipe_id] = cost
+        else:
+            missing.append(recipe_id)
+    
+    if missing:
+        generation = graph.generation
+        recipes = await db.recipes.find({"id": {"$in": missing}, "userId": user_id}, {"_id": 0}).to_list(None)
+        prices, semifinished = await load_cost_catalog(user_id, recipes)
+        semifinished_costs = compute_semifinished_costs(semifinished, prices)
+        for recipe in recipes:
+            costs[recipe["id"]] = compute_recipe_cost(recipe, prices, semifinished_costs)
+        
+        # Skip storing if a write invalidated part of the graph meanwhile
+        if graph.generation == generation:
+            for item in semifinished.values():
+                graph.store(("semifinished", item["id"]), semifinished_costs[item["id"]], semifinished_dependencies(item))
+            for recipe in recipes:
+                graph.store(("recipe", recipe["id"]), costs[recipe["id"]], recipe_dependencies(recipe))
+            cost_cache.evict()
+    
+    return costs
+
+async def get_semifinished_cost(user_id: str, semifinished_id: str) -> Optional[dict]:
+    graph = await get_cost_graph(user_id)
+    cost = graph.get(("semifinished", semifinished_id))
+    if cost is not None:
+        return cost
+    
+    # Read before the first query, so a write racing any of them discards the result
+    generation = graph.generation
+    item = await db.semifinished.find_one({"id": semifinished_id, "userId": user_id}, {"_id": 0})
+    if not item:
+        return None
+    
+    prices, catalog = await load_cost_catalog(user_id, [], [item])
+    costs = compute_semifinished_costs(catalog, prices)
+    if graph.generation == generation:
+        for nested in catalog.values():
+            graph.store(("semifinished", nested["id"]), costs[nested["id"]], semifinished_dependencies(nested))
+        cost_cache.evict()
+    return costs[semifinished_id]
+
+# Schema migrations
+async def acquire_lock(database, name: str, seconds: float) -> bool:
+    """Take the named lock document unless another process holds it; it
+    lapses after ``seconds`` so a crashed holder cannot keep it."""
+    now = datetime.now(timezone.utc)
+    try:
+        await database.locks.update_one(
+            {"_id": name, "expiresAt": {"$lt": now}},
+            {"$set": {"expiresAt": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+async def wait_for_lock(database, name: str, seconds: float):
+    """Take the named lock, waiting for the current holder to release it
+    or for its lock to lapse."""
+    while not await acquire_lock(database, name, seconds):
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+
+async def release_lock(database, name: str):
+    await database.locks.delete_one({"_id": name})
+
+USER_SCOPED_COLLECTIONS = ("clients", "ingredients", "recipes", "semifinished", "categories", "orders")
+
+async def migration_001_indexes(database):
+    for collection in USER_SCOPED_COLLECTIONS:
+        await database[collection].create_index([("userId", 1), ("id", 1)], unique=True, name="userId_id")
+    
+    await database.users.create_index("id", unique=True, name="id_unique")
+    await database.users.create_index("email", unique=True, name="email_unique")
+    
+    await database.orders.create_index([("userId", 1), ("dueDate", 1)], name="userId_dueDate")
+    await database.orders.create_index([("userId", 1), ("status", 1), ("createdAt", 1)], name="userId_status_createdAt")
+    await database.clients.create_index([("userId", 1), ("createdAt", 1)], name="userId_createdAt")
+    await database.recipes.create_index([("userId", 1), ("categoryId", 1)], name="userId_categoryId")
+    
+    # Reverse dependency lookups used by refresh_materialized_costs
+    await database.recipes.create_index([("userId", 1), ("ingredients.ingredientId", 1)], name="userId_ingredientId")
+    await database.recipes.create_index([("userId", 1), ("components.itemId", 1)], name="userId_componentItemId")
+    await database.semifinished.create_index([("userId", 1), ("ingredients.ingredientId", 1)], name="userId_ingredientId")
+    
+    await database.password_resets.create_index([("email", 1), ("code", 1)], name="email_code")
+
+async def migration_002_password_reset_ttl(database):
+    # Reset codes issued before expiresAt existed can never be cleaned up by the TTL index
+    await database.password_resets.delete_many({"expiresAt": {"$exists": False}})
+    await database.password_resets.create_index("expiresAt", expireAfterSeconds=0, name="expiresAt_ttl")
+
+INDEX_NOT_FOUND = 27
+
+async def migration_003_keyset_indexes(database):
+    # Keyset pagination sorts on (field, id); extend the plain sort indexes with id
+    keyset_indexes = {
+        "orders": ["dueDate", "createdAt"],
+        "clients": ["createdAt", "name"],
+        "ingredients": ["name"],
+        "recipes": ["name"],
+        "semifinished": ["name"],
+        "categories": ["name"],
+    }
+    for collection, fields in keyset_indexes.items():
+        for field in fields:
+            await database[collection].create_index(
+                [("userId", 1), (field, 1), ("id", 1)],
+                name=f"userId_{field}_id"
+            )
+    
+    for collection, name in (("orders", "userId_dueDate"), ("clients", "userId_createdAt")):
+        try:
+            await database[collection].drop_index(name)
+        except OperationFailure as error:
+            # Never created, or another worker dropped it first
+            if error.code != INDEX_NOT_FOUND:
+                raise
+
+async def migration_004_collection_versions(database):
+    await database.collection_versions.create_index(
+        [("userId", 1), ("collection", 1)],
+        unique=True,
+        name="userId_collection"
+    )
+
+async def migration_005_nested_semifinished(database):
+    # refresh_materialized_costs walks up from a changed semifinished product to the products containing it
+    await database.semifinished.create_index([("userId", 1), ("components.itemId", 1)], name="userId_componentItemId")
+
+async def migration_006_daily_stats(database):
+    await database.daily_stats.create_index([("userId", 1), ("day", 1)], unique=True, name="userId_day")
+    await wait_for_lock(database, "daily_stats_rebuild", DAILY_STATS_REBUILD_LOCK_SECONDS)
+    try:
+        await rebuild_daily_stats(database)
+    finally:
+        await release_lock(database, "daily_stats_rebuild")
+
+async def migration_007_client_order_stats(database):
+    # Per-client order filters and the client_order_stats $group
+    await database.orders.create_index([("userId", 1), ("clientId", 1)], name="userId_clientId")
+
+async def migration_008_order_client_snapshots(database):
+    # Renames and deletions were never propagated to orders before
+    for user_id in await database.orders.distinct("userId"):
+        report = await check_order_clients(database, user_id, repair=True)
+        if report["repaired"]:
+            await database.collection_versions.update_one(
+                {"userId": user_id, "collection": "orders"},
+                {"$inc": {"version": 1}},
+                upsert=True
+            )
+
+async def migration_009_search_keys(database):
+    for collection in SEARCH_FIELDS:
+        await database[collection].create_index([("userId", 1), ("searchKeys", 1)], name="userId_searchKeys")
+        operations = []
+        async for document in database[collection].find({}, {"_id": 1, **{field: 1 for field in SEARCH_FIELDS[collection]}}):
+            operations.append(UpdateOne({"_id": document["_id"]}, {"$set": {"searchKeys": search_keys(collection, document)}}))
+            if len(operations) == BULK_CHUNK_SIZE:
+                await database[collection].bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await database[collection].bulk_write(operations, ordered=False)
+
+async def migration_010_search_name_keys(database):
+    # search_keys gained the whole-name key; recompute every document's keys
+    await migration_009_search_keys(database)
+
+async def migration_011_change_stream_pre_images(database):
+    # A change stream can only tell whose document a delete removed from its
+    # pre-image; without them deletes reach only the deleting worker's streams
+    if not await is_replica_set(database):
+        return
+    existing = set(await database.list_collection_names())
+    try:
+        for name in EVENT_COLLECTIONS:
+            if name not in existing:
+                try:
+                    await database.create_collection(name)
+                except CollectionInvalid:
+                    pass
+            await database.command("collMod", name, changeStreamPreAndPostImages={"enabled": True})
+    except OperationFailure as error:
+        # Pre-images need MongoDB 6.0; older servers keep local delete events
+        logger.warning("Could not enable change stream pre-images: %s", error)
+
+# Append new migrations at the end; versions must never be reused or reordered
+MIGRATIONS = [
+    (1, "indexes", migration_001_indexes),
+    (2, "password_reset_ttl", migration_002_password_reset_ttl),
+    (3, "keyset_indexes", migration_003_keyset_indexes),
+    (4, "collection_versions", migration_004_collection_versions),
+    (5, "nested_semifinished", migration_005_nested_semifinished),
+    (6, "daily_stats", migration_006_daily_stats),
+    (7, "client_order_stats", migration_007_client_order_stats),
+    (8, "order_client_snapshots", migration_008_order_client_snapshots),
+    (9, "search_keys", migration_009_search_keys),
+    (10, "search_name_keys", migration_010_search_name_keys),
+    (11, "change_stream_pre_images", migration_011_change_stream_pre_images),
+]
+
+async def run_migrations(database) -> List[int]:
+    """Apply pending migrations in version order and record each one in
+    ``schema_migrations`` once it has finished.
+
+    Workers starting together take turns on the ``migrations`` lock: the
+    others wait, then find the versions already recorded. Every migration
+    is idempotent, so one whose runner died, or outlived its lock, is
+    simply run again.
+
+    Returns the versions applied by this call.
+    """
+    applied = {record["_id"] async for record in database.schema_migrations.find({}, {"_id": 1})}
+    if all(version in applied for version, _, _ in MIGRATIONS):
+        return []
+    
+    await wait_for_lock(database, "migrations", MIGRATIONS_LOCK_SECONDS)
+    try:
+        applied = {record["_id"] async for record in database.schema_migrations.find({}, {"_id": 1})}
+        newly_applied = []
+        for version, name, migration in MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info("Applying schema migration %s (%s)", version, name)
+            await migration(database)
+            await database.schema_migrations.update_one(
+                {"_id": version},
+                {"$set": {"name": name, "appliedAt": datetime.now(timezone.utc).isoformat()}},
+                upsert=True
+            )
+            newly_applied.append(version)
+        return newly_applied
+    finally:
+        await release_lock(database, "migrations")
+
+# Bulk import
+DECIMAL_COMMA = re.compile(r"-?\d+,\d+")
+
+def iter_import_rows(file: UploadFile):
+    """Yield ``(row_number, data)`` pairs from an uploaded CSV or XLSX sheet
+    without loading it whole. The first row holds the field names."""
+    extension = Path(file.filename or "").suffix.lower()
+    if extension == ".xlsx":
+        workbook = load_workbook(file.file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    elif extension == ".csv":
+        text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        rows = csv.reader(text, dialect)
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported file type, expected .csv or .xlsx")
+    
+    header = [str(name).strip() if name is not None else "" for name in next(rows, [])]
+    for row_number, values in enumerate(rows, start=2):
+        data = {}
+        for name, value in zip(header, values):
+            if not name or value is None:
+                continue
+            # Spreadsheet cells come back typed; let the models coerce from text
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            value = str(value).strip()
+            if not value:
+                continue
+            if DECIMAL_COMMA.fullmatch(value):
+                value = value.replace(",", ".")
+            data[name] = value
+        if data:
+            yield row_number, data
+
+# Collection -> (create model, update model, stored model)
+BULK_MODELS = {
+    "ingredients": (IngredientCreate, IngredientUpdate, Ingredient),
+    "clients": (ClientCreate, ClientUpdate, Client),
+    "recipes": (RecipeCreate, RecipeUpdate, Recipe),
+}
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in error.errors())
+
+async def bulk_upsert_chunk(user_id: str, collection: str, rows: List[tuple], renamed: Optional[List[str]] = None) -> List[dict]:
+    """Validate one chunk of ``(row_number, data)`` rows and apply it with a
+    single unordered ``bulk_write``.
+
+    Rows with an ``id`` update that document. Other rows are matched by
+    ``name`` and created when no document has it yet. A row that matches a
+    stored document only needs the columns it changes; new documents need
+    every required field. Returns one result per row; ids of updated
+    documents whose name changed are appended to ``renamed``.
+    """
+    create_model, update_model, model = BULK_MODELS[collection]
+    results = {}
+    valid = {}
+    for row_number, data in rows:
+        try:
+            fields = update_model(**data)
+        except ValidationError as error:
+            results[row_number] = {"row": row_number, "status": "error", "error": validation_message(error)}
+            continue
+        if data.get("id"):
+            key = ("id", str(data["id"]))
+        elif fields.name:
+            key = ("name", fields.name)
+        else:
+            results[row_number] = {"row": row_number, "status": "error", "error": "name: Field required"}
+            continue
+        if key in valid:
+            earlier = valid[key][0]
+            results[earlier] = {"row": earlier, "status": "duplicate", "error": f"Superseded by row {row_number}"}
+        valid[key] = (row_number, data, fields)
+    
+    ids = [value for kind, value in valid if kind == "id"]
+    names = [value for kind, value in valid if kind == "name"]
+    existing = {}
+    if valid:
+        async for document in db[collection].find(
+            {"userId": user_id, "$or": [{"id": {"$in": ids}}, {"name": {"$in": names}}]},
+            {"_id": 0, "searchKeys": 0}
+        ):
+            existing[("id", document["id"])] = document
+            existing.setdefault(("name", document["name"]), document)
+    
+    # A row matching a stored document only changes the columns it carries;
+    # derived fields are computed from the merged document
+    writes = {}
+    for key, (row_number, data, fields) in valid.items():
+        stored = existing.get(key)
+        if stored:
+            changes = {k: v for k, v in fields.model_dump(exclude_unset=True).items() if v is not None}
+            writes[key] = (row_number, stored, changes, {**stored, **changes})
+        elif key[0] == "id":
+            results[row_number] = {"row": row_number, "status": "error", "error": "Not found"}
+        else:
+            try:
+                fields = create_model(**data)
+            except ValidationError as error:
+                results[row_number] = {"row": row_number, "status": "error", "error": validation_message(error)}
+                continue
+            document = model(userId=user_id, **fields.model_dump()).model_dump()
+            writes[key] = (row_number, None, fields.model_dump(exclude_unset=True), document)
+    
+    if collection == "recipes":
+        recipes = [merged for _, _, _, merged in writes.values()]
+        prices, semifinished = await load_cost_catalog(user_id, recipes)
+        semifinished_costs = compute_semifinished_costs(semifinished, prices)
+        for _, _, changes, merged in writes.values():
+            changes.update(materialized_costs(compute_recipe_cost(merged, prices, semifinished_costs), RECIPE_COST_FIELDS))
+    
+    if collection in SEARCH_FIELDS:
+        for _, _, changes, merged in writes.values():
+            changes["searchKeys"] = search_keys(collection, merged)
+    
+    operations = []
+    for row_number, stored, changes, merged in writes.values():
+        if stored:
+            operations.append(UpdateOne({"id": stored["id"], "userId": user_id}, {"$set": changes}))
+            results[row_number] = {"row": row_number, "status": "updated", "id": stored["id"]}
+            if renamed is not None and merged["name"] != stored["name"]:
+                renamed.append(stored["id"])
+        else:
+            operations.append(UpdateOne(
+                {"userId": user_id, "name": merged["name"]},
+                {"$set": changes, "$setOnInsert": {k: v for k, v in merged.items() if k not in changes}},
+                upsert=True
+            ))
+            results[row_number] = {"row": row_number, "status": "created", "id": merged["id"]}
+    
+    if operations:
+        await db[collection].bulk_write(operations, ordered=False)
+    return [results[row_number] for row_number in sorted(results)]
+
+async def run_bulk_upsert(user_id: str, collection: str, rows, background_tasks: BackgroundTasks) -> dict:
+    """Apply ``(row_number, data)`` rows in chunks of ``BULK_CHUNK_SIZE`` and
+    return a per-row report. ``rows`` may be a blocking iterator (file
+    parsing), so chunks are pulled from it in a worker thread."""
+    rows = iter(rows)
+    results = []
+    renamed = []
+    while chunk := await asyncio.to_thread(list, itertools.islice(rows, BULK_CHUNK_SIZE)):
+        results.extend(await bulk_upsert_chunk(user_id, collection, chunk, renamed))
+    
+    changed_ids = [result["id"] for result in results if result["status"] in ("created", "updated")]
+    if changed_ids:
+        await bump_collection_version(user_id, collection)
+        publish_change(user_id, collection, "imported", ids=changed_ids)
+        node_type = {"ingredients": "ingredient", "recipes": "recipe"}.get(collection)
+        if node_type:
+            for document_id in changed_ids:
+                cost_cache.invalidate(user_id, node_type, document_id)
+        if collection == "ingredients":
+            background_tasks.add_task(refresh_materialized_costs, user_id, ingredient_ids=changed_ids)
+        if collection == "clients":
+            # Orders carry the client's name, as in update_client
+            for client_id in renamed:
+                background_tasks.add_task(propagate_client, user_id, client_id)
+    
+    summary = {status: 0 for status in ("created", "updated", "duplicate", "error")}
+    for result in results:
+        summary[result["status"]] += 1
+    return {**summary, "results": results}
+
+# Export
+# CSV columns per collection; dotted names read nested fields. NDJSON rows
+# carry the whole document instead.
+EXPORT_COLUMNS = {
+    "orders": ["id", "clientId", "client.name", "item", "dueDate", "total", "status", "notes", "createdAt"],
+    "clients": ["id", "name", "email", "phone", "createdAt"],
+    "ingredients": ["id", "name", "unit", "price"],
+    "recipes": ["id", "name", "categoryId", "description", "laborCost", "markup", "recipeCost", "totalCost", "finalPrice"],
+    "semifinished": ["id", "name", "unit", "laborCost", "ingredientsCost", "totalCost", "finalPrice"],
+}
+
+def export_value(document: dict, column: str):
+    value = document
+    for key in column.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return "" if value is None else value
+
+async def export_chunks(cursor, collection: str, format: str):
+    """Encode documents from ``cursor`` as they arrive, one chunk per
+    ``EXPORT_BATCH_SIZE`` rows, so memory stays flat however much is exported."""
+    columns = EXPORT_COLUMNS[collection]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == "csv":
+        # BOM so spreadsheet apps detect UTF-8 (Cyrillic names)
+        buffer.write("\ufeff")
+        writer.writerow(columns)
+    rows = 0
+    async for document in cursor:
+        if format == "csv":
+            writer.writerow([export_value(document, column) for column in columns])
+        else:
+            buffer.write(orjson.dumps(document).decode())
+            buffer.write("\n")
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def export_response(collection: str, query: dict, sort: str, format: str) -> StreamingResponse:
+    cursor = db[collection].find(query, {"_id": 0, "userId": 0, "searchKeys": 0}).sort([(sort, 1), ("id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"{collection}-{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        export_chunks(cursor, collection, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # Auth routes
 @api_router.post("/auth/signup", response_model=Token)
 async def signup(user_data: UserCreate):
@@ -249,9 +1923,13 @@ async def signup(user_data: UserCreate):
     )
     
     user_dict = user.model_dump()
-    user_dict["password"] = hash_password(user_data.password)
+    user_dict["password"] = await hash_password(user_data.password)
     
-    await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        # A concurrent signup won the race past the check above
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create token
     access_token = create_access_token(data={"sub": user.id})
@@ -261,7 +1939,7 @@ async def signup(user_data: UserCreate):
 @api_router.post("/auth/login", response_model=Token)
 async def login(user_data: UserLogin):
     user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
-    if not user or not verify_password(user_data.password, user["password"]):
+    if not user or not await verify_password(user_data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     user_obj = User(**user)
@@ -279,6 +1957,7 @@ async def update_me(user_data: UserUpdate, current_user: User = Depends(get_curr
     
     if update_dict:
         await db.users.update_one({"id": current_user.id}, {"$set": update_dict})
+        user_cache.invalidate(current_user.id)
     
     updated_user = await db.users.find_one({"id": current_user.id}, {"_id": 0})
     return User(**updated_user)
@@ -291,12 +1970,13 @@ async def change_password(password_data: PasswordChange, current_user: User = De
         raise HTTPException(status_code=404, detail="Користувача не знайдено")
     
     # Verify current password
-    if not verify_password(password_data.current_password, user["password"]):
+    if not await verify_password(password_data.current_password, user["password"]):
         raise HTTPException(status_code=400, detail="Неправильний поточний пароль")
     
     # Update password
-    hashed_password = hash_password(password_data.new_password)
+    hashed_password = await hash_password(password_data.new_password)
     await db.users.update_one({"id": current_user.id}, {"$set": {"password": hashed_password}})
+    user_cache.invalidate(current_user.id)
     
     return {"message": "Пароль успішно змінено"}
 
@@ -311,12 +1991,14 @@ async def password_reset_request(request_data: PasswordResetRequest):
     # Generate 6-digit reset code
     reset_code = ''.join([str(random.randint(0, 9)) for _ in range(6)])
     
-    # Store reset code with expiration (15 minutes)
+    # Store reset code with expiration (15 minutes); expiresAt drives the TTL index
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=15)
     await db.password_resets.insert_one({
         "email": request_data.email,
         "code": reset_code,
         "created_at": datetime.now(timezone.utc).isoformat(),
-        "expires_at": (datetime.now(timezone.utc) + timedelta(minutes=15)).isoformat()
+        "expires_at": expires_at.isoformat(),
+        "expiresAt": expires_at
     })
     
     # In production, send email here. For now, return code (remove in production!)
@@ -339,131 +2021,356 @@ async def password_reset(reset_data: PasswordReset):
         raise HTTPException(status_code=400, detail="Код відновлення прострочений")
     
     # Update user password
-    hashed_password = hash_password(reset_data.new_password)
-    result = await db.users.update_one(
+    hashed_password = await hash_password(reset_data.new_password)
+    user = await db.users.find_one_and_update(
         {"email": reset_data.email},
-        {"$set": {"password": hashed_password}}
+        {"$set": {"password": hashed_password}},
+        projection={"_id": 0, "id": 1}
     )
     
-    if result.matched_count == 0:
+    if user is None:
         raise HTTPException(status_code=404, detail="Користувача не знайдено")
+    user_cache.invalidate(user["id"])
     
     # Delete used reset code
     await db.password_resets.delete_many({"email": reset_data.email})
     
     return {"message": "Пароль успішно змінено"}
 
-@api_router.post("/upload/avatar")
-async def upload_avatar(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
-    # Save file
-    file_extension = file.filename.split(".")[-1]
-    filename = f"avatar_{current_user.id}.{file_extension}"
-    file_path = UPLOADS_DIR / filename
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+@api_router.post("/upload/avatar", openapi_extra=UPLOAD_OPENAPI)
+async def upload_avatar(request: Request, current_user: User = Depends(get_current_user)):
+    filename = await store_upload(request)
     
     # Update user avatar
     avatar_url = f"/uploads/{filename}"
     await db.users.update_one({"id": current_user.id}, {"$set": {"avatar": avatar_url}})
+    user_cache.invalidate(current_user.id)
     
     return {"avatarUrl": avatar_url}
 
-@api_router.post("/upload/recipe")
-async def upload_recipe_image(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
-    file_extension = file.filename.split(".")[-1]
-    filename = f"recipe_{uuid.uuid4()}.{file_extension}"
-    file_path = UPLOADS_DIR / filename
+@api_router.post("/upload/recipe", openapi_extra=UPLOAD_OPENAPI)
+async def upload_recipe_image(request: Request, current_user: User = Depends(get_current_user)):
+    filename = await store_upload(request)
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    try:
+        thumbnails = await asyncio.get_running_loop().run_in_executor(
+            request.app.state.thumbnail_executor, render_thumbnails, str(UPLOADS_DIR / filename), THUMBNAIL_SIZES
+        )
+    except Exception:
+        # Not a decodable image; keep the original without variants
+        logger.warning("Could not render thumbnails for %s", filename)
+        thumbnails = {}
     
-    return {"imageUrl": f"/uploads/{filename}"}
+    return {
+        "imageUrl": f"/uploads/{filename}",
+        "thumbnails": {size: f"/uploads/{name}" for size, name in thumbnails.items()}
+    }
+
+# Denormalized client fields
+def client_snapshot(client: dict) -> dict:
+    """The client fields copied into each of its orders."""
+    return {"id": client["id"], "name": client["name"]}
+
+async def update_orders_in_batches(database, query: dict, update: dict) -> List[str]:
+    """Apply ``update`` to the orders matching ``query`` with one
+    ``update_many`` per ``PROPAGATION_BATCH_SIZE`` orders, so a client with a
+    long history never turns into one long write. ``query`` must stop
+    matching an order once it is updated. Returns the updated order ids."""
+    updated = []
+    while True:
+        batch = database.orders.find(query, {"_id": 0, "id": 1}).limit(PROPAGATION_BATCH_SIZE)
+        order_ids = [order["id"] async for order in batch]
+        if not order_ids:
+            return updated
+        await database.orders.update_many({**query, "id": {"$in": order_ids}}, update)
+        updated.extend(order_ids)
+
+async def sync_order_clients(database, user_id: str, client_id: str) -> List[str]:
+    """Bring the ``client`` snapshot of a client's orders in line with the
+    client document. Orders of a deleted client keep its last name and are
+    flagged ``client.deleted``. Idempotent; returns the updated order ids."""
+    client = await database.clients.find_one({"id": client_id, "userId": user_id}, {"_id": 0, "id": 1, "name": 1})
+    if client:
+        query = {
+            "userId": user_id,
+            "clientId": client_id,
+            "$or": [{"client.name": {"$ne": client["name"]}}, {"client.deleted": {"$exists": True}}]
+        }
+        update = {"$set": {"client": client_snapshot(client)}}
+    else:
+        query = {"userId": user_id, "clientId": client_id, "client.deleted": {"$ne": True}}
+        update = {"$set": {"client.deleted": True}}
+    return await update_orders_in_batches(database, query, update)
+
+async def propagate_client(user_id: str, client_id: str):
+    """Background fan-out of a client edit or deletion to its orders,
+    retried with exponential backoff. Drift left behind by a propagation
+    that keeps failing is found and fixed by ``check_order_clients``."""
+    for attempt in range(PROPAGATION_RETRIES):
+        try:
+            updated = await sync_order_clients(db, user_id, client_id)
+            break
+        except PyMongoError:
+            if attempt == PROPAGATION_RETRIES - 1:
+                logger.exception("Could not propagate client %s to its orders", client_id)
+                return
+            await asyncio.sleep(0.5 * 2 ** attempt)
+    
+    if updated:
+        await bump_collection_version(user_id, "orders")
+        publish_change(user_id, "orders", "refreshed", ids=updated)
+
+async def check_order_clients(database, user_id: str, repair: bool = False) -> dict:
+    """Find orders whose ``client`` snapshot disagrees with the clients
+    collection: ``stale`` ones still carry an old name and ``orphaned`` ones
+    belong to a deleted client but are not flagged yet. One pass over the
+    user's orders; with ``repair`` only the drifted clients are synced."""
+    names = {
+        client["id"]: client["name"]
+        async for client in database.clients.find({"userId": user_id}, {"_id": 0, "id": 1, "name": 1})
+    }
+    stale = orphaned = 0
+    drifted = set()
+    orders = database.orders.find({"userId": user_id}, {"_id": 0, "clientId": 1, "client": 1}).batch_size(BULK_CHUNK_SIZE)
+    async for order in orders:
+        snapshot = order.get("client") or {}
+        client_id = order["clientId"]
+        if client_id in names:
+            if snapshot.get("name") != names[client_id] or "deleted" in snapshot:
+                stale += 1
+                drifted.add(client_id)
+        elif not snapshot.get("deleted"):
+            orphaned += 1
+            drifted.add(client_id)
+    
+    repaired = []
+    if repair:
+        for client_id in drifted:
+            repaired.extend(await sync_order_clients(database, user_id, client_id))
+    return {"stale": stale, "orphaned": orphaned, "repaired": repaired}
 
 # Clients routes
-@api_router.get("/clients", response_model=List[Client])
-async def get_clients(current_user: User = Depends(get_current_user)):
-    clients = await db.clients.find({"userId": current_user.id}, {"_id": 0}).to_list(1000)
-    return clients
+@api_router.get("/clients/export")
+async def export_clients(format: Literal["csv", "ndjson"] = "csv", current_user: User = Depends(get_current_user)):
+    return export_response("clients", {"userId": current_user.id}, "name", format)
+
+async def client_order_stats(user_id: str, client_ids: Optional[List[str]] = None) -> dict:
+    """Order count, lifetime value (cancelled orders excluded), last order
+    date and open orders per client id, from one ``$group`` over orders."""
+    match = {"userId": user_id}
+    if client_ids is not None:
+        match["clientId"] = {"$in": client_ids}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$clientId",
+            "orderCount": {"$sum": 1},
+            "lifetimeValue": {"$sum": {"$cond": [{"$eq": ["$status", "Cancelled"]}, 0, "$total"]}},
+            "lastOrderDate": {"$max": "$createdAt"},
+            "openOrders": {"$sum": {"$cond": [{"$in": ["$status", ["Delivered", "Cancelled"]]}, 0, 1]}}
+        }}
+    ]
+    return {stats.pop("_id"): stats async for stats in db.orders.aggregate(pipeline)}
+
+NO_ORDER_STATS = {"orderCount": 0, "lifetimeValue": 0.0, "lastOrderDate": None, "openOrders": 0}
+
+@api_router.get("/clients", response_model=List[Union[ClientWithStats, Client]])
+async def get_clients(
+    request: Request,
+    response: Response,
+    sort: Literal["createdAt", "name"] = "createdAt",
+    order: Literal["asc", "desc"] = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    withStats: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    collections = ("clients", "orders") if withStats else ("clients",)
+    not_modified = await check_not_modified(request, response, current_user.id, *collections)
+    if not_modified:
+        return not_modified
+    
+    clients = await find_page(db.clients, {"userId": current_user.id}, sort, order, limit, cursor, response)
+    if not withStats:
+        return list_response(clients, Client, response)
+    
+    # A page only needs its own clients grouped; the full list groups every order once
+    stats = await client_order_stats(current_user.id, [client["id"] for client in clients] if limit else None)
+    for client in clients:
+        client.update(stats.get(client["id"], NO_ORDER_STATS))
+    return list_response(clients, ClientWithStats, response)
 
 @api_router.post("/clients", response_model=Client)
 async def create_client(client_data: ClientCreate, current_user: User = Depends(get_current_user)):
     client = Client(userId=current_user.id, **client_data.model_dump())
-    await db.clients.insert_one(client.model_dump())
+    await db.clients.insert_one(with_search_keys("clients", client.model_dump()))
+    await bump_collection_version(current_user.id, "clients")
+    publish_change(current_user.id, "clients", "created", client.model_dump())
     return client
 
+@api_router.post("/clients/import")
+async def import_clients(background_tasks: BackgroundTasks, file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+    return await run_bulk_upsert(current_user.id, "clients", iter_import_rows(file), background_tasks)
+
 @api_router.put("/clients/{client_id}", response_model=Client)
-async def update_client(client_id: str, client_data: ClientCreate, current_user: User = Depends(get_current_user)):
-    result = await db.clients.update_one(
+async def update_client(client_id: str, client_data: ClientCreate, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
+    previous_client = await db.clients.find_one_and_update(
         {"id": client_id, "userId": current_user.id},
-        {"$set": client_data.model_dump()}
+        {"$set": with_search_keys("clients", client_data.model_dump())},
+        projection={"_id": 0, "searchKeys": 0}
     )
-    if result.matched_count == 0:
+    if previous_client is None:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    updated_client = await db.clients.find_one({"id": client_id}, {"_id": 0})
+    # Orders carry the client's name; a rename reaches them in the background
+    if previous_client["name"] != client_data.name:
+        background_tasks.add_task(propagate_client, current_user.id, client_id)
+    await bump_collection_version(current_user.id, "clients")
+    
+    updated_client = {**previous_client, **client_data.model_dump()}
+    publish_change(current_user.id, "clients", "updated", updated_client)
     return Client(**updated_client)
 
 @api_router.delete("/clients/{client_id}")
-async def delete_client(client_id: str, current_user: User = Depends(get_current_user)):
+async def delete_client(client_id: str, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
     result = await db.clients.delete_one({"id": client_id, "userId": current_user.id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Client not found")
+    background_tasks.add_task(propagate_client, current_user.id, client_id)
+    await bump_collection_version(current_user.id, "clients")
+    publish_change(current_user.id, "clients", "deleted", {"id": client_id})
     return {"message": "Client deleted"}
 
 # Ingredients routes
+@api_router.get("/ingredients/export")
+async def export_ingredients(format: Literal["csv", "ndjson"] = "csv", current_user: User = Depends(get_current_user)):
+    return export_response("ingredients", {"userId": current_user.id}, "name", format)
+
 @api_router.get("/ingredients", response_model=List[Ingredient])
-async def get_ingredients(current_user: User = Depends(get_current_user)):
-    ingredients = await db.ingredients.find({"userId": current_user.id}, {"_id": 0}).to_list(1000)
-    return ingredients
+async def get_ingredients(
+    request: Request,
+    response: Response,
+    sort: Literal["name"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    not_modified = await check_not_modified(request, response, current_user.id, "ingredients")
+    if not_modified:
+        return not_modified
+    
+    ingredients = await find_page(db.ingredients, {"userId": current_user.id}, sort, order, limit, cursor, response)
+    return list_response(ingredients, Ingredient, response)
 
 @api_router.post("/ingredients", response_model=Ingredient)
 async def create_ingredient(ingredient_data: IngredientCreate, current_user: User = Depends(get_current_user)):
     ingredient = Ingredient(userId=current_user.id, **ingredient_data.model_dump())
-    await db.ingredients.insert_one(ingredient.model_dump())
+    await db.ingredients.insert_one(with_search_keys("ingredients", ingredient.model_dump()))
+    await bump_collection_version(current_user.id, "ingredients")
+    publish_change(current_user.id, "ingredients", "created", ingredient.model_dump())
     return ingredient
 
+@api_router.post("/ingredients/bulk")
+async def bulk_upsert_ingredients(request_data: BulkUpsertRequest, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
+    return await run_bulk_upsert(current_user.id, "ingredients", enumerate(request_data.items, start=1), background_tasks)
+
+@api_router.post("/ingredients/import")
+async def import_ingredients(background_tasks: BackgroundTasks, file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+    return await run_bulk_upsert(current_user.id, "ingredients", iter_import_rows(file), background_tasks)
+
 @api_router.put("/ingredients/{ingredient_id}", response_model=Ingredient)
-async def update_ingredient(ingredient_id: str, ingredient_data: IngredientCreate, current_user: User = Depends(get_current_user)):
+async def update_ingredient(ingredient_id: str, ingredient_data: IngredientCreate, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
     result = await db.ingredients.update_one(
         {"id": ingredient_id, "userId": current_user.id},
-        {"$set": ingredient_data.model_dump()}
+        {"$set": with_search_keys("ingredients", ingredient_data.model_dump())}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Ingredient not found")
     
-    updated_ingredient = await db.ingredients.find_one({"id": ingredient_id}, {"_id": 0})
+    cost_cache.invalidate(current_user.id, "ingredient", ingredient_id)
+    background_tasks.add_task(refresh_materialized_costs, current_user.id, ingredient_ids=[ingredient_id])
+    await bump_collection_version(current_user.id, "ingredients")
+    
+    updated_ingredient = await db.ingredients.find_one({"id": ingredient_id, "userId": current_user.id}, {"_id": 0, "searchKeys": 0})
+    publish_change(current_user.id, "ingredients", "updated", updated_ingredient)
     return Ingredient(**updated_ingredient)
 
 @api_router.delete("/ingredients/{ingredient_id}")
-async def delete_ingredient(ingredient_id: str, current_user: User = Depends(get_current_user)):
+async def delete_ingredient(ingredient_id: str, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
     result = await db.ingredients.delete_one({"id": ingredient_id, "userId": current_user.id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Ingredient not found")
+    
+    cost_cache.invalidate(current_user.id, "ingredient", ingredient_id)
+    background_tasks.add_task(refresh_materialized_costs, current_user.id, ingredient_ids=[ingredient_id])
+    await bump_collection_version(current_user.id, "ingredients")
+    publish_change(current_user.id, "ingredients", "deleted", {"id": ingredient_id})
     return {"message": "Ingredient deleted"}
 
 # Recipes routes
+@api_router.get("/recipes/export")
+async def export_recipes(format: Literal["csv", "ndjson"] = "csv", current_user: User = Depends(get_current_user)):
+    return export_response("recipes", {"userId": current_user.id}, "name", format)
+
 @api_router.get("/recipes", response_model=List[Recipe])
-async def get_recipes(current_user: User = Depends(get_current_user)):
-    recipes = await db.recipes.find({"userId": current_user.id}, {"_id": 0}).to_list(1000)
-    return recipes
+async def get_recipes(
+    request: Request,
+    response: Response,
+    categoryId: Optional[str] = None,
+    sort: Literal["name"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    not_modified = await check_not_modified(request, response, current_user.id, "recipes")
+    if not_modified:
+        return not_modified
+    
+    query = {"userId": current_user.id}
+    if categoryId:
+        query["categoryId"] = categoryId
+    recipes = await find_page(db.recipes, query, sort, order, limit, cursor, response)
+    await backfill_recipe_costs(current_user.id, recipes)
+    return list_response(recipes, Recipe, response)
 
 @api_router.post("/recipes", response_model=Recipe)
 async def create_recipe(recipe_data: RecipeCreate, current_user: User = Depends(get_current_user)):
-    recipe = Recipe(userId=current_user.id, **recipe_data.model_dump())
-    await db.recipes.insert_one(recipe.model_dump())
+    recipe_dict = recipe_data.model_dump()
+    prices, semifinished = await load_cost_catalog(current_user.id, [recipe_dict])
+    cost = compute_recipe_cost(recipe_dict, prices, compute_semifinished_costs(semifinished, prices))
+    
+    recipe = Recipe(userId=current_user.id, **recipe_dict, **materialized_costs(cost, RECIPE_COST_FIELDS))
+    await db.recipes.insert_one(with_search_keys("recipes", recipe.model_dump()))
+    await bump_collection_version(current_user.id, "recipes")
+    publish_change(current_user.id, "recipes", "created", recipe.model_dump())
     return recipe
 
+@api_router.post("/recipes/bulk")
+async def bulk_upsert_recipes(request_data: BulkUpsertRequest, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
+    return await run_bulk_upsert(current_user.id, "recipes", enumerate(request_data.items, start=1), background_tasks)
+
 @api_router.put("/recipes/{recipe_id}", response_model=Recipe)
 async def update_recipe(recipe_id: str, recipe_data: RecipeCreate, current_user: User = Depends(get_current_user)):
+    recipe_dict = recipe_data.model_dump()
+    prices, semifinished = await load_cost_catalog(current_user.id, [recipe_dict])
+    cost = compute_recipe_cost(recipe_dict, prices, compute_semifinished_costs(semifinished, prices))
+    
+    # The image is set by the upload flow; an edit that does not send it keeps it
+    changes = {key: value for key, value in recipe_dict.items() if key not in RECIPE_IMAGE_FIELDS or key in recipe_data.model_fields_set}
     result = await db.recipes.update_one(
         {"id": recipe_id, "userId": current_user.id},
-        {"$set": recipe_data.model_dump()}
+        {"$set": {**with_search_keys("recipes", changes), **materialized_costs(cost, RECIPE_COST_FIELDS)}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Recipe not found")
     
-    updated_recipe = await db.recipes.find_one({"id": recipe_id}, {"_id": 0})
+    cost_cache.invalidate(current_user.id, "recipe", recipe_id)
+    await bump_collection_version(current_user.id, "recipes")
+    
+    updated_recipe = await db.recipes.find_one({"id": recipe_id, "userId": current_user.id}, {"_id": 0, "searchKeys": 0})
+    publish_change(current_user.id, "recipes", "updated", updated_recipe)
     return Recipe(**updated_recipe)
 
 @api_router.delete("/recipes/{recipe_id}")
@@ -471,76 +2378,66 @@ async def delete_recipe(recipe_id: str, current_user: User = Depends(get_current
     result = await db.recipes.delete_one({"id": recipe_id, "userId": current_user.id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Recipe not found")
+    
+    cost_cache.invalidate(current_user.id, "recipe", recipe_id)
+    await bump_collection_version(current_user.id, "recipes")
+    publish_change(current_user.id, "recipes", "deleted", {"id": recipe_id})
     return {"message": "Recipe deleted"}
 
 @api_router.get("/recipes/{recipe_id}/calculate")
 async def calculate_recipe_cost(recipe_id: str, current_user: User = Depends(get_current_user)):
-    recipe = await db.recipes.find_one({"id": recipe_id, "userId": current_user.id}, {"_id": 0})
-    if not recipe:
+    costs = await get_recipe_costs(current_user.id, [recipe_id])
+    if recipe_id not in costs:
         raise HTTPException(status_code=404, detail="Recipe not found")
+    return costs[recipe_id]
+
+@api_router.post("/recipes/calculate")
+async def calculate_recipes_cost(request_data: RecipeCostRequest, current_user: User = Depends(get_current_user)):
+    costs = await get_recipe_costs(current_user.id, [item.recipeId for item in request_data.items])
     
-    # Calculate cost from old ingredients format (backward compatibility)
-    total_cost = 0
-    for recipe_ing in recipe.get("ingredients", []):
-        ingredient = await db.ingredients.find_one(
-            {"id": recipe_ing["ingredientId"], "userId": current_user.id},
-            {"_id": 0}
-        )
-        if ingredient:
-            total_cost += ingredient["price"] * recipe_ing["quantity"]
-    
-    # Calculate cost from new components format
-    for component in recipe.get("components", []):
-        if component["type"] == "ingredient":
-            ingredient = await db.ingredients.find_one(
-                {"id": component["itemId"], "userId": current_user.id},
-                {"_id": 0}
-            )
-            if ingredient:
-                total_cost += ingredient["price"] * component["quantity"]
-        elif component["type"] == "semifinished":
-            # Calculate semifinished cost
-            semifinished = await db.semifinished.find_one(
-                {"id": component["itemId"], "userId": current_user.id},
-                {"_id": 0}
-            )
-            if semifinished:
-                # Calculate semifinished ingredients cost
-                sf_cost = 0
-                for sf_ing in semifinished.get("ingredients", []):
-                    ingredient = await db.ingredients.find_one(
-                        {"id": sf_ing["ingredientId"], "userId": current_user.id},
-                        {"_id": 0}
-                    )
-                    if ingredient:
-                        sf_cost += ingredient["price"] * sf_ing["quantity"]
-                
-                sf_total = sf_cost + semifinished.get("laborCost", 0)
-                total_cost += sf_total * component["quantity"]
-    
-    labor_cost = recipe.get("laborCost", 0)
-    markup = recipe.get("markup", 0)
-    
-    final_price = (total_cost + labor_cost) * (1 + markup / 100)
+    items = []
+    missing = []
+    total = 0
+    for item in request_data.items:
+        cost = costs.get(item.recipeId)
+        if cost is None:
+            missing.append(item.recipeId)
+            continue
+        line_total = cost["finalPrice"] * item.quantity
+        total += line_total
+        items.append({
+            "recipeId": item.recipeId,
+            "quantity": item.quantity,
+            **cost,
+            "lineTotal": line_total
+        })
     
-    return {
-        "recipeCost": total_cost,
-        "laborCost": labor_cost,
-        "totalCost": total_cost + labor_cost,
-        "markup": markup,
-        "finalPrice": final_price
-    }
+    return {"items": items, "missing": missing, "total": total}
 
 # Category routes
 @api_router.get("/categories", response_model=List[Category])
-async def get_categories(current_user: User = Depends(get_current_user)):
-    categories = await db.categories.find({"userId": current_user.id}, {"_id": 0}).to_list(1000)
-    return categories
+async def get_categories(
+    request: Request,
+    response: Response,
+    sort: Literal["name"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    not_modified = await check_not_modified(request, response, current_user.id, "categories")
+    if not_modified:
+        return not_modified
+    
+    categories = await find_page(db.categories, {"userId": current_user.id}, sort, order, limit, cursor, response)
+    return list_response(categories, Category, response)
 
 @api_router.post("/categories", response_model=Category)
 async def create_category(category_data: CategoryCreate, current_user: User = Depends(get_current_user)):
     category = Category(userId=current_user.id, **category_data.model_dump())
     await db.categories.insert_one(category.model_dump())
+    await bump_collection_version(current_user.id, "categories")
+    publish_change(current_user.id, "categories", "created", category.model_dump())
     return category
 
 @api_router.put("/categories/{category_id}", response_model=Category)
@@ -550,7 +2447,9 @@ async def update_category(category_id: str, category_data: CategoryCreate, curre
         raise HTTPException(status_code=404, detail="Category not found")
     
     updated_category = {**category, **category_data.model_dump()}
-    await db.categories.update_one({"id": category_id}, {"$set": updated_category})
+    await db.categories.update_one({"id": category_id, "userId": current_user.id}, {"$set": updated_category})
+    await bump_collection_version(current_user.id, "categories")
+    publish_change(current_user.id, "categories", "updated", updated_category)
     return Category(**updated_category)
 
 @api_router.delete("/categories/{category_id}")
@@ -563,72 +2462,339 @@ async def delete_category(category_id: str, current_user: User = Depends(get_cur
     result = await db.categories.delete_one({"id": category_id, "userId": current_user.id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    await bump_collection_version(current_user.id, "categories")
+    publish_change(current_user.id, "categories", "deleted", {"id": category_id})
     return {"message": "Category deleted"}
 
 # Semifinished routes
+@api_router.get("/semifinished/export")
+async def export_semifinished(format: Literal["csv", "ndjson"] = "csv", current_user: User = Depends(get_current_user)):
+    return export_response("semifinished", {"userId": current_user.id}, "name", format)
+
 @api_router.get("/semifinished", response_model=List[Semifinished])
-async def get_semifinished(current_user: User = Depends(get_current_user)):
-    items = await db.semifinished.find({"userId": current_user.id}, {"_id": 0}).to_list(1000)
-    return items
+async def get_semifinished(
+    request: Request,
+    response: Response,
+    sort: Literal["name"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    not_modified = await check_not_modified(request, response, current_user.id, "semifinished")
+    if not_modified:
+        return not_modified
+    
+    items = await find_page(db.semifinished, {"userId": current_user.id}, sort, order, limit, cursor, response)
+    await backfill_semifinished_costs(current_user.id, items)
+    return list_response(items, Semifinished, response)
 
 @api_router.post("/semifinished", response_model=Semifinished)
 async def create_semifinished(semifinished_data: SemifinishedCreate, current_user: User = Depends(get_current_user)):
     semifinished = Semifinished(userId=current_user.id, **semifinished_data.model_dump())
+    semifinished_dict = semifinished.model_dump()
+    prices, catalog = await load_cost_catalog(current_user.id, [], [semifinished_dict])
+    cost = compute_semifinished_costs(catalog, prices)[semifinished.id]
+    
+    semifinished = semifinished.model_copy(update=materialized_costs(cost, SEMIFINISHED_COST_FIELDS))
     await db.semifinished.insert_one(semifinished.model_dump())
+    await bump_collection_version(current_user.id, "semifinished")
+    publish_change(current_user.id, "semifinished", "created", semifinished.model_dump())
     return semifinished
 
 @api_router.put("/semifinished/{semifinished_id}", response_model=Semifinished)
-async def update_semifinished(semifinished_id: str, semifinished_data: SemifinishedCreate, current_user: User = Depends(get_current_user)):
+async def update_semifinished(semifinished_id: str, semifinished_data: SemifinishedCreate, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
+    semifinished_dict = semifinished_data.model_dump()
+    prices, catalog = await load_cost_catalog(current_user.id, [], [{"id": semifinished_id, **semifinished_dict}])
+    _, cyclic = topological_order(catalog)
+    if cyclic:
+        raise HTTPException(status_code=400, detail="Semifinished product cannot contain itself")
+    cost = compute_semifinished_costs(catalog, prices)[semifinished_id]
+    
     result = await db.semifinished.update_one(
         {"id": semifinished_id, "userId": current_user.id},
-        {"$set": semifinished_data.model_dump()}
+        {"$set": {**semifinished_dict, **materialized_costs(cost, SEMIFINISHED_COST_FIELDS)}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Semifinished not found")
     
-    updated = await db.semifinished.find_one({"id": semifinished_id}, {"_id": 0})
+    cost_cache.invalidate(current_user.id, "semifinished", semifinished_id)
+    background_tasks.add_task(refresh_materialized_costs, current_user.id, semifinished_ids=[semifinished_id])
+    await bump_collection_version(current_user.id, "semifinished")
+    
+    updated = await db.semifinished.find_one({"id": semifinished_id, "userId": current_user.id}, {"_id": 0})
+    publish_change(current_user.id, "semifinished", "updated", updated)
     return Semifinished(**updated)
 
 @api_router.delete("/semifinished/{semifinished_id}")
-async def delete_semifinished(semifinished_id: str, current_user: User = Depends(get_current_user)):
+async def delete_semifinished(semifinished_id: str, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
     result = await db.semifinished.delete_one({"id": semifinished_id, "userId": current_user.id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Semifinished not found")
+    
+    cost_cache.invalidate(current_user.id, "semifinished", semifinished_id)
+    background_tasks.add_task(refresh_materialized_costs, current_user.id, semifinished_ids=[semifinished_id])
+    await bump_collection_version(current_user.id, "semifinished")
+    publish_change(current_user.id, "semifinished", "deleted", {"id": semifinished_id})
     return {"message": "Semifinished deleted"}
 
 @api_router.get("/semifinished/{semifinished_id}/calculate")
 async def calculate_semifinished_cost(semifinished_id: str, current_user: User = Depends(get_current_user)):
-    item = await db.semifinished.find_one({"id": semifinished_id, "userId": current_user.id}, {"_id": 0})
-    if not item:
+    cost = await get_semifinished_cost(current_user.id, semifinished_id)
+    if cost is None:
         raise HTTPException(status_code=404, detail="Semifinished not found")
+    return cost
+
+# Orders routes
+@api_router.get("/orders", response_model=List[Order])
+async def get_orders(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    clientId: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    sort: Literal["dueDate", "createdAt"] = "dueDate",
+    order: Literal["asc", "desc"] = "desc",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    not_modified = await check_not_modified(request, response, current_user.id, "orders")
+    if not_modified:
+        return not_modified
     
-    # Calculate cost
-    total_cost = 0
-    for ing in item.get("ingredients", []):
-        ingredient = await db.ingredients.find_one(
-            {"id": ing["ingredientId"], "userId": current_user.id},
-            {"_id": 0}
+    query = {"userId": current_user.id}
+    if status:
+        # Comma-separated list, e.g. ?status=New,In Progress
+        query["status"] = {"$in": status.split(",")}
+    if clientId:
+        query["clientId"] = clientId
+    # Date filters apply to the sort field (dueDate by default)
+    if date_from or date_to:
+        query[sort] = date_range_query(date_from, date_to)
+    
+    orders = await find_page(db.orders, query, sort, order, limit, cursor, response)
+    return list_response(orders, Order, response)
+
+@api_router.get("/orders/export")
+async def export_orders(
+    format: Literal["csv", "ndjson"] = "csv",
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    current_user: User = Depends(get_current_user)
+):
+    query = {"userId": current_user.id}
+    if date_from or date_to:
+        query["dueDate"] = date_range_query(date_from, date_to)
+    return export_response("orders", query, "dueDate", format)
+
+@api_router.get("/orders/range", response_model=List[Order])
+async def get_orders_range(
+    request: Request,
+    response: Response,
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    not_modified = await check_not_modified(request, response, current_user.id, "orders")
+    if not_modified:
+        return not_modified
+    
+    query = {"userId": current_user.id, "dueDate": date_range_query(date_from, date_to)}
+    orders = await find_page(db.orders, query, "dueDate", "asc", limit, cursor, response)
+    return list_response(orders, Order, response)
+
+@api_router.get("/orders/calendar")
+async def get_orders_calendar(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    granularity: Literal["day", "week", "month"] = "day",
+    current_user: User = Depends(get_current_user)
+):
+    day = {"$substrCP": ["$dueDate", 0, 10]}
+    if granularity == "day":
+        bucket = day
+    elif granularity == "week":
+        # ISO week, e.g. 2025-W07
+        bucket = {"$dateToString": {"format": "%G-W%V", "date": {"$dateFromString": {"dateString": day}}}}
+    else:
+        bucket = {"$substrCP": ["$dueDate", 0, 7]}
+    
+    pipeline = [
+        {"$match": {"userId": current_user.id, "dueDate": date_range_query(date_from, date_to)}},
+        {"$group": {
+            "_id": {"bucket": bucket, "status": "$status"},
+            "count": {"$sum": 1},
+            "total": {"$sum": "$total"}
+        }},
+        {"$group": {
+            "_id": "$_id.bucket",
+            "count": {"$sum": "$count"},
+            "total": {"$sum": "$total"},
+            "statuses": {"$push": {"k": "$_id.status", "v": "$count"}}
+        }},
+        {"$project": {"_id": 0, "bucket": "$_id", "count": 1, "total": 1, "statuses": {"$arrayToObject": "$statuses"}}},
+        {"$sort": {"bucket": 1}}
+    ]
+    return await db.orders.aggregate(pipeline).to_list(None)
+
+async def check_order_lines(user_id: str, lines: List[OrderLine]):
+    recipe_ids = list({line.recipeId for line in lines})
+    if recipe_ids:
+        found = await db.recipes.count_documents({"userId": user_id, "id": {"$in": recipe_ids}})
+        if found != len(recipe_ids):
+            raise HTTPException(status_code=404, detail="Recipe not found")
+
+# Daily stats rollups
+def rollup_deltas(order: dict, sign: int, deltas: dict):
+    """Accumulate into ``deltas`` the ``$inc`` an order contributes to the
+    ``daily_stats`` document of its user and UTC creation day; ``sign`` is 1
+    to add the order and -1 to take it back out."""
+    inc = deltas.setdefault((order["userId"], order["createdAt"][:10]), {})
+    # The status becomes part of a field path; anything unknown is pooled
+    status = order.get("status") or "New"
+    if status not in ORDER_STATUSES:
+        status = "Other"
+    total = order.get("total") or 0
+    for field, value in (
+        ("count", sign),
+        ("total", sign * total),
+        (f"statuses.{status}.count", sign),
+        (f"statuses.{status}.total", sign * total),
+    ):
+        inc[field] = inc.get(field, 0) + value
+
+# Order fields a rollup is computed from; ``statsRevision`` counts the
+# writes that changed them, so a rebuild can order what it scanned against
+# changes queued meanwhile
+ROLLUP_FIELDS = ("id", "userId", "createdAt", "status", "total", "statsRevision")
+
+def rollup_state(order: dict) -> dict:
+    return {field: order.get(field) for field in ROLLUP_FIELDS}
+
+async def update_daily_stats(before: Optional[dict] = None, after: Optional[dict] = None):
+    """Move an order's contribution from its ``before`` to its ``after``
+    state; a status or total change becomes one atomic ``$inc`` on the
+    rollup of the order's creation day.
+
+    While a rebuild holds that rollup (``rebuilding`` is set), the change is
+    queued on it as the order's new state instead; the rebuild applies it.
+    """
+    deltas = {}
+    if before:
+        rollup_deltas(before, -1, deltas)
+    if after:
+        rollup_deltas(after, 1, deltas)
+    # createdAt never changes, so both states fall on the same rollup
+    (user_id, day), inc = next(iter(deltas.items()))
+    inc = {field: value for field, value in inc.items() if value}
+    if not inc:
+        return
+    if after:
+        pending = {"orderId": after["id"], "statsRevision": after.get("statsRevision") or 0, "order": rollup_state(after)}
+    else:
+        pending = {"orderId": before["id"], "statsRevision": (before.get("statsRevision") or 0) + 1, "order": None}
+    while True:
+        try:
+            # A rebuilding rollup fails the filter, and the upsert then hits the unique index
+            await db.daily_stats.update_one(
+                {"userId": user_id, "day": day, "rebuilding": {"$ne": True}},
+                {"$inc": inc},
+                upsert=True
+            )
+            return
+        except DuplicateKeyError:
+            pass
+        result = await db.daily_stats.update_one(
+            {"userId": user_id, "day": day, "rebuilding": True},
+            {"$push": {"pending": pending}}
         )
-        if ingredient:
-            total_cost += ingredient["price"] * ing["quantity"]
+        if result.matched_count:
+            return
+        # The rebuild finished in between; increment as usual
+
+def rollup_document(user_id: str, day: str, orders) -> dict:
+    """A whole ``daily_stats`` document for the given orders of one day."""
+    deltas = {}
+    for order in orders:
+        rollup_deltas(order, 1, deltas)
+    rollup = {"userId": user_id, "day": day}
+    for field, value in deltas.get((user_id, day), {}).items():
+        *path, name = field.split(".")
+        target = rollup
+        for key in path:
+            target = target.setdefault(key, {})
+        target[name] = value
+    return rollup
+
+async def rebuild_daily_stats(database, user_id: Optional[str] = None):
+    """Recompute rollups from the orders themselves, e.g. after a backfill.
+    Callers must hold the ``daily_stats_rebuild`` lock.
+
+    Orders may be written meanwhile. Every rollup in scope is first set
+    ``rebuilding``, so update_daily_stats queues changes on it rather than
+    incrementing it; that includes today's and tomorrow's, where new orders
+    land. Each rollup is then replaced by the scanned orders with newer
+    queued states applied on top. The replace only matches if nothing was
+    queued since the rollup was read, and is retried otherwise. Days left
+    without orders are removed. A rebuild that dies half way leaves the
+    queue in place for the next one.
+    """
+    query = {"userId": user_id} if user_id else {}
+    user_ids = [user_id] if user_id else await database.users.distinct("id")
+    today = datetime.now(timezone.utc).date()
+    keys = {(uid, day.isoformat()) for uid in user_ids for day in (today, today + timedelta(days=1))}
+    async for order in database.orders.find(query, {"_id": 0, "userId": 1, "createdAt": 1}).batch_size(BULK_CHUNK_SIZE):
+        keys.add((order["userId"], order["createdAt"][:10]))
+    await database.daily_stats.update_many(query, {"$set": {"rebuilding": True}})
+    flags = [UpdateOne({"userId": uid, "day": day}, {"$set": {"rebuilding": True}}, upsert=True) for uid, day in keys]
+    for start in range(0, len(flags), BULK_CHUNK_SIZE):
+        await database.daily_stats.bulk_write(flags[start:start + BULK_CHUNK_SIZE], ordered=False)
     
-    labor_cost = item.get("laborCost", 0)
-    final_price = total_cost + labor_cost
+    scanned = defaultdict(dict)  # (userId, day) -> {order id: state}
+    async for order in database.orders.find(query, {"_id": 0, **{field: 1 for field in ROLLUP_FIELDS}}).batch_size(BULK_CHUNK_SIZE):
+        scanned[(order["userId"], order["createdAt"][:10])][order["id"]] = order
     
-    return {
-        "ingredientsCost": total_cost,
-        "laborCost": labor_cost,
-        "totalCost": total_cost + labor_cost,
-        "finalPrice": final_price
-    }
-
-# Orders routes
-@api_router.get("/orders", response_model=List[Order])
-async def get_orders(current_user: User = Depends(get_current_user)):
-    orders = await db.orders.find({"userId": current_user.id}, {"_id": 0}).to_list(1000)
-    # Sort by dueDate
-    orders.sort(key=lambda x: x.get("dueDate", ""), reverse=True)
-    return orders
+    async for rollup in database.daily_stats.find({**query, "rebuilding": True}):
+        key = (rollup["userId"], rollup["day"])
+        while True:
+            pending = rollup.get("pending", [])
+            orders = dict(scanned.get(key, {}))
+            for entry in pending:
+                current = orders.get(entry["orderId"])
+                if current is not None and (current.get("statsRevision") or 0) >= entry["statsRevision"]:
+                    continue
+                if entry["order"] is None:
+                    orders.pop(entry["orderId"], None)
+                else:
+                    orders[entry["orderId"]] = entry["order"]
+            # Matches only while the queue still holds exactly what was read
+            unchanged = {"_id": rollup["_id"], "rebuilding": True, f"pending.{len(pending)}": {"$exists": False}}
+            if orders:
+                result = await database.daily_stats.replace_one(unchanged, rollup_document(*key, orders.values()))
+                matched = result.matched_count
+            else:
+                result = await database.daily_stats.delete_one(unchanged)
+                matched = result.deleted_count
+            if matched:
+                break
+            rollup = await database.daily_stats.find_one({"_id": rollup["_id"]})
+
+@api_router.get("/orders/consistency")
+async def check_orders_consistency(current_user: User = Depends(get_current_user)):
+    report = await check_order_clients(db, current_user.id)
+    return {"stale": report["stale"], "orphaned": report["orphaned"]}
+
+@api_router.post("/orders/consistency/repair")
+async def repair_orders_consistency(current_user: User = Depends(get_current_user)):
+    report = await check_order_clients(db, current_user.id, repair=True)
+    if report["repaired"]:
+        await bump_collection_version(current_user.id, "orders")
+        publish_change(current_user.id, "orders", "refreshed", ids=report["repaired"])
+    return {"stale": report["stale"], "orphaned": report["orphaned"], "repaired": len(report["repaired"])}
 
 @api_router.post("/orders", response_model=Order)
 async def create_order(order_data: OrderCreate, current_user: User = Depends(get_current_user)):
@@ -636,13 +2802,17 @@ async def create_order(order_data: OrderCreate, current_user: User = Depends(get
     client = await db.clients.find_one({"id": order_data.clientId, "userId": current_user.id}, {"_id": 0})
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
+    await check_order_lines(current_user.id, order_data.lines)
     
     order = Order(
         userId=current_user.id,
-        client={"id": client["id"], "name": client["name"]},
+        client=client_snapshot(client),
         **order_data.model_dump()
     )
     await db.orders.insert_one(order.model_dump())
+    await update_daily_stats(after=order.model_dump())
+    await bump_collection_version(current_user.id, "orders")
+    publish_change(current_user.id, "orders", "created", order.model_dump())
     return order
 
 @api_router.put("/orders/{order_id}", response_model=Order)
@@ -657,26 +2827,339 @@ async def update_order(order_id: str, order_data: OrderUpdate, current_user: Use
         )
         if not client:
             raise HTTPException(status_code=404, detail="Client not found")
-        update_dict["client"] = {"id": client["id"], "name": client["name"]}
+        update_dict["client"] = client_snapshot(client)
+    if order_data.lines is not None:
+        await check_order_lines(current_user.id, order_data.lines)
     
-    result = await db.orders.update_one(
+    previous_order = await db.orders.find_one_and_update(
         {"id": order_id, "userId": current_user.id},
-        {"$set": update_dict}
+        {"$set": update_dict, "$inc": {"statsRevision": 1}},
+        projection={"_id": 0}
     )
-    if result.matched_count == 0:
+    if previous_order is None:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    updated_order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    # The update is a plain $set, so the new state needs no second read
+    updated_order = {**previous_order, **update_dict, "statsRevision": (previous_order.get("statsRevision") or 0) + 1}
+    await update_daily_stats(before=previous_order, after=updated_order)
+    await bump_collection_version(current_user.id, "orders")
+    
+    publish_change(current_user.id, "orders", "updated", updated_order)
     return Order(**updated_order)
 
 @api_router.delete("/orders/{order_id}")
 async def delete_order(order_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.orders.delete_one({"id": order_id, "userId": current_user.id})
-    if result.deleted_count == 0:
+    deleted_order = await db.orders.find_one_and_delete({"id": order_id, "userId": current_user.id}, projection={"_id": 0})
+    if deleted_order is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    await update_daily_stats(before=deleted_order)
+    await bump_collection_version(current_user.id, "orders")
+    publish_change(current_user.id, "orders", "deleted", {"id": order_id})
     return {"message": "Order deleted"}
 
+# Production planning
+def ingredient_requirements(recipes: List[dict], quantities: np.ndarray, semifinished: dict):
+    """Total ingredient quantities for ``quantities[i]`` units of ``recipes[i]``.
+
+    Recipes are laid out as a sparse (COO) recipe x ingredient matrix plus a
+    recipe x semifinished matrix that expands, after nested products are
+    resolved in topological order, through a semifinished x ingredient
+    matrix. Each product with the ordered quantities is a single
+    ``np.bincount``, so the cost is linear in the catalog's line items
+    however many orders there are. Returns ``(required, ingredient_ids)``.
+    """
+    ingredient_index = {}
+    semifinished_index = {item_id: row for row, item_id in enumerate(semifinished)}
+    direct = []  # (recipe row, ingredient column, quantity)
+    uses = []  # (recipe row, semifinished row, quantity)
+    for row, recipe in enumerate(recipes):
+        for ing in recipe.get("ingredients", []):
+            direct.append((row, ingredient_index.setdefault(ing["ingredientId"], len(ingredient_index)), ing["quantity"]))
+        for component in recipe.get("components", []):
+            if component["type"] == "ingredient":
+                direct.append((row, ingredient_index.setdefault(component["itemId"], len(ingredient_index)), component["quantity"]))
+            elif component["itemId"] in semifinished_index:
+                uses.append((row, semifinished_index[component["itemId"]], component["quantity"]))
+    contents = []  # (semifinished row, ingredient column, quantity)
+    for item_id, item in semifinished.items():
+        for ing in item.get("ingredients", []):
+            contents.append((semifinished_index[item_id], ingredient_index.setdefault(ing["ingredientId"], len(ingredient_index)), ing["quantity"]))
+        for component in item.get("components", []):
+            if component["type"] == "ingredient":
+                contents.append((semifinished_index[item_id], ingredient_index.setdefault(component["itemId"], len(ingredient_index)), component["quantity"]))
+    
+    def multiply(vector: np.ndarray, entries: list, columns: int) -> np.ndarray:
+        """``vector @ matrix`` for a matrix given as (row, column, value) entries."""
+        if not entries:
+            return np.zeros(columns)
+        rows, cols, values = (np.array(part) for part in zip(*entries))
+        return np.bincount(cols, weights=vector[rows] * values, minlength=columns)
+    
+    required = multiply(quantities, direct, len(ingredient_index))
+    if uses:
+        semifinished_quantities = multiply(quantities, uses, len(semifinished))
+        # Push quantities down into nested products, containers before contents
+        order, _ = topological_order(semifinished)
+        for item_id in reversed(order):
+            row = semifinished_index[item_id]
+            if semifinished_quantities[row]:
+                for component in semifinished[item_id].get("components", []):
+                    if component["type"] == "semifinished" and component["itemId"] in semifinished_index:
+                        semifinished_quantities[semifinished_index[component["itemId"]]] += semifinished_quantities[row] * component["quantity"]
+        required += multiply(semifinished_quantities, contents, len(ingredient_index))
+    return required, list(ingredient_index)
+
+@api_router.get("/planning/requirements")
+async def get_planning_requirements(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    status: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    query = {"userId": current_user.id, "dueDate": date_range_query(date_from, date_to)}
+    # Comma-separated list; cancelled orders are left out by default
+    query["status"] = {"$in": status.split(",")} if status else {"$ne": "Cancelled"}
+    
+    ordered, unstructured = await asyncio.gather(
+        db.orders.aggregate([
+            {"$match": query},
+            {"$unwind": "$lines"},
+            {"$group": {"_id": "$lines.recipeId", "quantity": {"$sum": "$lines.quantity"}}}
+        ]).to_list(None),
+        db.orders.count_documents({**query, "lines.0": {"$exists": False}})
+    )
+    quantities = {line["_id"]: line["quantity"] for line in ordered}
+    
+    recipes = await db.recipes.find(
+        {"userId": current_user.id, "id": {"$in": list(quantities)}},
+        {"_id": 0, "id": 1, "name": 1, "ingredients": 1, "components": 1}
+    ).to_list(None)
+    prices, semifinished = await load_cost_catalog(current_user.id, recipes)
+    required, ingredient_ids = ingredient_requirements(
+        recipes, np.array([quantities[recipe["id"]] for recipe in recipes], dtype=float), semifinished
+    )
+    costs = required * np.array([prices.get(ingredient_id, 0.0) for ingredient_id in ingredient_ids])
+    
+    details = {}
+    if ingredient_ids:
+        async for ingredient in db.ingredients.find(
+            {"userId": current_user.id, "id": {"$in": ingredient_ids}},
+            {"_id": 0, "id": 1, "name": 1, "unit": 1}
+        ):
+            details[ingredient["id"]] = ingredient
+    
+    ingredients = [
+        {
+            "ingredientId": ingredient_id,
+            "name": details.get(ingredient_id, {}).get("name"),
+            "unit": details.get(ingredient_id, {}).get("unit"),
+            "quantity": float(required[column]),
+            "price": prices.get(ingredient_id),
+            "cost": float(costs[column]),
+        }
+        for column, ingredient_id in enumerate(ingredient_ids)
+        if required[column] > 0
+    ]
+    ingredients.sort(key=lambda ingredient: ingredient["name"] or "")
+    
+    found = {recipe["id"] for recipe in recipes}
+    return {
+        "from": date_from,
+        "to": date_to,
+        "recipes": [
+            {"recipeId": recipe["id"], "name": recipe["name"], "quantity": quantities[recipe["id"]]}
+            for recipe in recipes
+        ],
+        "ingredients": ingredients,
+        "totalCost": float(costs.sum()),
+        "missingRecipes": [recipe_id for recipe_id in quantities if recipe_id not in found],
+        "unstructuredOrders": unstructured,
+    }
+
+# Change events stream
+@api_router.post("/events/token")
+async def create_events_stream_token(current_user: User = Depends(get_current_user)):
+    return {"token": create_events_token(current_user.id), "expiresIn": EVENTS_TOKEN_EXPIRE_SECONDS}
+
+@api_router.get("/events")
+async def stream_events(current_user: User = Depends(get_event_user)):
+    async def events():
+        queue = event_hub.subscribe(current_user.id)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": ping\n\n"
+                    continue
+                yield f"data: {orjson.dumps(event).decode()}\n\n"
+        finally:
+            event_hub.unsubscribe(current_user.id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Bootstrap
+# Collection name -> (model, default list sort), matching the list endpoints
+BOOTSTRAP_COLLECTIONS = {
+    "recipes": (Recipe, "name", 1),
+    "ingredients": (Ingredient, "name", 1),
+    "semifinished": (Semifinished, "name", 1),
+    "categories": (Category, "name", 1),
+    "clients": (Client, "createdAt", 1),
+    "orders": (Order, "dueDate", -1),
+}
+
+@api_router.get("/bootstrap")
+async def get_bootstrap(
+    request: Request,
+    response: Response,
+    include: str = ",".join(BOOTSTRAP_COLLECTIONS),
+    current_user: User = Depends(get_current_user)
+):
+    collections = list(dict.fromkeys(name.strip() for name in include.split(",") if name.strip()))
+    unknown = [name for name in collections if name not in BOOTSTRAP_COLLECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown collections: {', '.join(unknown)}")
+    
+    not_modified = await check_not_modified(request, response, current_user.id, *collections)
+    if not_modified:
+        return not_modified
+    
+    async def load(name: str) -> List[dict]:
+        model, sort, direction = BOOTSTRAP_COLLECTIONS[name]
+        documents = await db[name].find({"userId": current_user.id}, {"_id": 0}).sort(
+            [(sort, direction), ("id", direction)]
+        ).to_list(None)
+        if name == "recipes":
+            await backfill_recipe_costs(current_user.id, documents)
+        elif name == "semifinished":
+            await backfill_semifinished_costs(current_user.id, documents)
+        adapter = list_adapter(model)
+        return adapter.dump_python(adapter.validate_python(documents), mode="json")
+    
+    # One round trip for everything a page needs on mount
+    results = await asyncio.gather(*(load(name) for name in collections))
+    return dict(zip(collections, results))
+
+# Search
+# Searchable fields per collection. Each document stores their words,
+# case-folded, as ``searchKeys``; a multikey (userId, searchKeys) index then
+# serves word-prefix queries as anchored regex range scans in any script.
+# The whole normalized name is stored as one more key behind NAME_KEY, so
+# exact and prefix name matches are found through the same index.
+SEARCH_FIELDS = {
+    "clients": ("name", "email", "phone"),
+    "recipes": ("name", "description"),
+    "ingredients": ("name",),
+}
+SEARCH_WORD = re.compile(r"\w+")
+NAME_KEY = "="
+APOSTROPHES = str.maketrans("", "", "'’ʼ`")
+
+def normalize_search_text(text: str) -> str:
+    # Ukrainian words keep apostrophes (м'ята); ё is usually typed as е
+    return text.casefold().translate(APOSTROPHES).replace("ё", "е")
+
+def search_keys(collection: str, document: dict) -> List[str]:
+    keys = set()
+    for field in SEARCH_FIELDS[collection]:
+        value = document.get(field)
+        if not value:
+            continue
+        text = normalize_search_text(value)
+        keys.update(SEARCH_WORD.findall(text))
+        if field == "name":
+            keys.add(NAME_KEY + " ".join(text.split()))
+        elif field == "email":
+            keys.add(text)
+        elif field == "phone":
+            # Match +380 67 123 45 67 as typed in full or in local format
+            digits = re.sub(r"\D", "", value)
+            keys.update(key for key in (digits, digits[-10:]) if key)
+    return sorted(keys)
+
+def with_search_keys(collection: str, document: dict) -> dict:
+    return {**document, "searchKeys": search_keys(collection, document)}
+
+def search_rank(query: str, tokens: List[str], document: dict) -> tuple:
+    """Sort key: exact name, name prefix, every word in the name, then
+    matches in other fields; shorter names first within a group."""
+    name = normalize_search_text(document.get("name", ""))
+    if name == query:
+        group = 0
+    elif name.startswith(query):
+        group = 1
+    elif all(any(word.startswith(token) for word in SEARCH_WORD.findall(name)) for token in tokens):
+        group = 2
+    else:
+        group = 3
+    return group, len(name), name
+
+@api_router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: str = ",".join(SEARCH_FIELDS),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user)
+):
+    collections = list(dict.fromkeys(name.strip() for name in types.split(",") if name.strip()))
+    unknown = [name for name in collections if name not in SEARCH_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown)}")
+    
+    query = normalize_search_text(q).strip()
+    tokens = sorted(set(SEARCH_WORD.findall(query)), key=len, reverse=True)
+    if not tokens:
+        return []
+    
+    # Candidates are capped per collection, so the best groups of
+    # search_rank are fetched first: the exact name, names starting with
+    # the query, then documents where every word prefixes a key (the
+    # longest word gives the tightest index bounds)
+    name_key = NAME_KEY + " ".join(query.split())
+    conditions = (
+        {"searchKeys": name_key},
+        {"searchKeys": re.compile("^" + re.escape(name_key))},
+        {"$and": [{"searchKeys": re.compile("^" + re.escape(token))} for token in tokens]},
+    )
+    
+    async def find(collection: str) -> List[dict]:
+        projection = {"_id": 0, "id": 1, **{field: 1 for field in SEARCH_FIELDS[collection]}}
+        documents = {}
+        for condition in conditions:
+            remaining = SEARCH_CANDIDATES - len(documents)
+            if remaining <= 0:
+                break
+            cursor = db[collection].find(
+                {"userId": current_user.id, "id": {"$nin": list(documents)}, **condition},
+                projection
+            ).limit(remaining)
+            async for document in cursor:
+                documents[document["id"]] = document
+        return [{"type": collection, **document} for document in documents.values()]
+    
+    candidates = itertools.chain.from_iterable(await asyncio.gather(*(find(name) for name in collections)))
+    return sorted(candidates, key=lambda document: search_rank(query, tokens, document))[:limit]
+
 # Dashboard stats
+@api_router.get("/stats/cache")
+async def get_cache_stats(current_user: User = Depends(get_current_user)):
+    return {"users": user_cache.stats()}
+
+@api_router.get("/stats/events")
+async def get_event_stats(current_user: User = Depends(get_current_user)):
+    return event_hub.stats()
+
+@api_router.get("/stats/password-hashing")
+async def get_password_hashing_stats(current_user: User = Depends(get_current_user)):
+    return password_hasher.stats()
+
 @api_router.get("/stats/dashboard")
 async def get_dashboard_stats(period: str = "month", current_user: User = Depends(get_current_user)):
     # Calculate date range
@@ -693,62 +3176,129 @@ async def get_dashboard_stats(period: str = "month", current_user: User = Depend
     else:
         start_date = now - timedelta(days=30)
     
-    start_date_str = start_date.isoformat()
-    
-    # Get all orders
-    orders = await db.orders.find({"userId": current_user.id}, {"_id": 0}).to_list(1000)
+    week_ago = (now - timedelta(days=7)).isoformat()
+    month_ago = (now - timedelta(days=30)).isoformat()
     
-    # Calculate total revenue (delivered orders in period)
-    total_revenue = sum(
-        order["total"] for order in orders
-        if order["status"] == "Delivered" and order.get("createdAt", "") >= start_date_str
-    )
+    # Every figure is an index-bounded count, an index-ordered limit or a
+    # read of at most one rollup per day, so the cost does not grow with
+    # the number of orders
+    async def total_revenue() -> float:
+        # Delivered orders by creation day, whole days from the period start
+        rollups = db.daily_stats.find(
+            {"userId": current_user.id, "day": {"$gte": start_date.date().isoformat()}},
+            {"_id": 0, "statuses.Delivered.total": 1}
+        )
+        return sum([rollup.get("statuses", {}).get("Delivered", {}).get("total", 0) async for rollup in rollups])
     
-    # Active orders
-    active_orders = sum(
-        1 for order in orders
-        if order["status"] in ["New", "In Progress"]
-    )
+    upcoming_orders = db.orders.find(
+        {"userId": current_user.id, "status": {"$nin": ["Delivered", "Cancelled"]}},
+        {"_id": 0}
+    ).sort([("dueDate", 1), ("id", 1)]).limit(5)
     
-    # Recent activities (new orders in last week)
-    week_ago = (now - timedelta(days=7)).isoformat()
-    recent_activities = sum(
-        1 for order in orders
-        if order.get("createdAt", "") >= week_ago
+    revenue, total_clients, new_clients, active_orders, recent_activities, upcoming = await asyncio.gather(
+        total_revenue(),
+        db.clients.count_documents({"userId": current_user.id}),
+        db.clients.count_documents({"userId": current_user.id, "createdAt": {"$gte": month_ago}}),
+        db.orders.count_documents({"userId": current_user.id, "status": {"$in": ["New", "In Progress"]}}),
+        # Recent activities (new orders in last week)
+        db.orders.count_documents({"userId": current_user.id, "createdAt": {"$gte": week_ago}}),
+        upcoming_orders.to_list(5)
     )
     
-    # Get clients stats
-    clients = await db.clients.find({"userId": current_user.id}, {"_id": 0}).to_list(1000)
-    month_ago = (now - timedelta(days=30)).isoformat()
-    new_clients = sum(1 for client in clients if client.get("createdAt", "") >= month_ago)
-    
-    # Upcoming orders (next 5)
-    upcoming_orders = [
-        order for order in orders
-        if order["status"] not in ["Delivered", "Cancelled"]
-    ]
-    upcoming_orders.sort(key=lambda x: x.get("dueDate", ""))
-    upcoming_orders = upcoming_orders[:5]
-    
     return {
-        "totalRevenue": total_revenue,
-        "totalClients": len(clients),
+        "totalRevenue": revenue,
+        "totalClients": total_clients,
         "newClients": new_clients,
         "activeOrders": active_orders,
         "recentActivities": recent_activities,
-        "upcomingOrders": upcoming_orders
+        "upcomingOrders": upcoming
     }
 
+@api_router.get("/stats/timeseries")
+async def get_stats_timeseries(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    bucket: Literal["day", "week", "month"] = "day",
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        first_day, last_day = date.fromisoformat(date_from[:10]), date.fromisoformat(date_to[:10])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date")
+    
+    # Reads one rollup document per day with orders, however many orders there are
+    rollups = db.daily_stats.find(
+        {"userId": current_user.id, "day": {"$gte": first_day.isoformat(), "$lte": last_day.isoformat()}},
+        {"_id": 0, "day": 1, "count": 1, "total": 1, "statuses": 1}
+    ).sort("day", 1)
+    
+    series = {}
+    async for rollup in rollups:
+        day = date.fromisoformat(rollup["day"])
+        if bucket == "day":
+            key = rollup["day"]
+        elif bucket == "week":
+            year, week, _ = day.isocalendar()
+            key = f"{year}-W{week:02d}"
+        else:
+            key = rollup["day"][:7]
+        point = series.setdefault(key, {"bucket": key, "count": 0, "total": 0, "revenue": 0, "statuses": {}})
+        point["count"] += rollup.get("count", 0)
+        point["total"] += rollup.get("total", 0)
+        for status, values in rollup.get("statuses", {}).items():
+            if values.get("count"):
+                point["statuses"][status] = point["statuses"].get(status, 0) + values["count"]
+            if status == "Delivered":
+                point["revenue"] += values.get("total", 0)
+    return [point for point in series.values() if point["count"]]
+
+@api_router.post("/stats/timeseries/rebuild")
+async def rebuild_stats_timeseries(current_user: User = Depends(get_current_user)):
+    # Repairs rollups missed by writes that bypassed them, e.g. from workers
+    # still running an older release during a rolling deploy
+    if not await acquire_lock(db, "daily_stats_rebuild", DAILY_STATS_REBUILD_LOCK_SECONDS):
+        raise HTTPException(status_code=409, detail="A rollup rebuild is already running")
+    try:
+        await rebuild_daily_stats(db, current_user.id)
+    finally:
+        await release_lock(db, "daily_stats_rebuild")
+    return {"message": "Rollups rebuilt"}
+
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Health probes: liveness only needs the event loop, readiness needs a
+# finished warm-up and a MongoDB answering within the ping timeout
+@app.get("/health/live", include_in_schema=False)
+async def health_live():
+    return {"status": "alive"}
+
+@app.get("/health/ready", include_in_schema=False)
+async def health_ready(request: Request):
+    if not getattr(request.app.state, "ready", False):
+        return ORJSONResponse({"status": "starting"}, status_code=503)
+    
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), HEALTH_PING_TIMEOUT_SECONDS)
+    except (PyMongoError, asyncio.TimeoutError) as error:
+        return ORJSONResponse({"status": "unavailable", "mongo": {"error": str(error) or "Ping timed out"}}, status_code=503)
+    latency_ms = (time.perf_counter() - started) * 1000
+    return {"status": "ready", "mongo": {"latencyMs": round(latency_ms, 2)}}
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Configure logging
 logging.basicConfig(
@@ -756,7 +3306,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""Image thumbnails, rendered in server.py's thumbnail process pool.
+
+Kept apart from server.py so that the pool's spawned workers import Pillow
+only, not the app with its MongoDB client.
+"""
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+def render_thumbnails(source: str, sizes: tuple) -> dict:
+    """Write WebP variants of an image next to it and return their
+    filenames by size."""
+    source_path = Path(source)
+    thumbnails = {}
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        for size in sizes:
+            target = source_path.with_name(f"{source_path.stem}_{size}.webp")
+            if not target.exists():
+                variant = image.copy()
+                variant.thumbnail((size, size))
+                variant.save(target, "WEBP", quality=80)
+            thumbnails[str(size)] = target.name
+    return thumbnails
@@ -327,7 +327,20 @@ class ConfectionaryCRMTester:
                 self.log(f"✅ Recipe cost calculation: {cost_data}")
             else:
                 return False
-        
+
+            success, bulk_data = self.run_test(
+                "Bulk Calculate Recipe Costs",
+                "POST",
+                "recipes/calculate",
+                200,
+                {"items": [{"recipeId": recipe_id, "quantity": 2}]}
+            )
+
+            if success:
+                self.log(f"✅ Bulk recipe cost calculation total: {bulk_data.get('total')}")
+            else:
+                return False
+
         return True
 
     def test_orders_crud(self):
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+End-to-end API benchmark on a synthetic bakery dataset.
+
+Seeds MongoDB (or an in-memory mongomock database with --mongo-url memory)
+with one user's clients, ingredients, semifinished products, recipes and
+orders, then drives the FastAPI app in-process through httpx's ASGI
+transport. Reports p50/p95/p99 latency, throughput and MongoDB commands per
+request for each endpoint. Command counts come from the app's command
+listener and are only available against a real MongoDB.
+
+    python benchmarks/api.py --orders 50000 --save benchmarks/baseline.json
+    python benchmarks/api.py --compare benchmarks/baseline.json
+
+Results can be saved as a JSON baseline and compared against a previous run;
+the comparison exits non-zero when an endpoint's p95 latency or command count
+regresses by more than --threshold percent.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+STATUSES = ["New", "In Progress", "Ready", "Delivered", "Cancelled"]
+UNITS = ["кг", "л", "шт", "г"]
+INSERT_BATCH = 5000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+                        help='MongoDB URL, or "memory" for an in-memory mongomock database')
+    parser.add_argument("--db-name", default="cake_bb_benchmark")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded database afterwards")
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--ingredients", type=int, default=3000)
+    parser.add_argument("--semifinished", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=4, help="levels of nested semifinished products")
+    parser.add_argument("--recipes", type=int, default=2000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="comma-separated endpoint names to run")
+    parser.add_argument("--save", type=Path, help="write results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="compare results with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    return parser.parse_args()
+
+
+def batches(items: list, size: int = INSERT_BATCH):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def make_dataset(server, user_id: str, args, rng: random.Random) -> dict:
+    """Build every document in memory, with materialized costs filled in the
+    same way the write routes would."""
+    categories = [
+        server.Category(userId=user_id, name=f"Категорія {i}").model_dump() for i in range(args.categories)
+    ]
+    clients = [
+        server.Client(
+            userId=user_id,
+            name=f"Клієнт {i}",
+            email=f"client{i}@example.com",
+            phone=f"+380{rng.randrange(10**8, 10**9)}",
+        ).model_dump()
+        for i in range(args.clients)
+    ]
+    ingredients = [
+        server.Ingredient(
+            userId=user_id, name=f"Інгредієнт {i}", unit=rng.choice(UNITS), price=round(rng.uniform(5, 500), 2)
+        ).model_dump()
+        for i in range(args.ingredients)
+    ]
+    ingredient_ids = [ingredient["id"] for ingredient in ingredients]
+    prices = {ingredient["id"]: ingredient["price"] for ingredient in ingredients}
+
+    # Products are built in levels; each one above the first contains a few
+    # products from the level below it, giving trees --depth levels deep
+    semifinished = []
+    levels = [[] for _ in range(max(1, args.depth))]
+    for i in range(args.semifinished):
+        level = i % len(levels)
+        components = [
+            {"type": "semifinished", "itemId": child["id"], "quantity": round(rng.uniform(0.1, 1), 3)}
+            for child in rng.sample(levels[level - 1], min(len(levels[level - 1]), rng.randint(1, 3)))
+        ] if level else []
+        item = server.Semifinished(
+            userId=user_id,
+            name=f"Напівфабрикат {i}",
+            unit="кг",
+            laborCost=round(rng.uniform(0, 100), 2),
+            ingredients=[
+                {"ingredientId": ingredient_id, "quantity": round(rng.uniform(0.05, 2), 3)}
+                for ingredient_id in rng.sample(ingredient_ids, rng.randint(3, 8))
+            ],
+            components=components,
+        ).model_dump()
+        levels[level].append(item)
+        semifinished.append(item)
+    semifinished_by_id = {item["id"]: item for item in semifinished}
+    semifinished_costs = server.compute_semifinished_costs(semifinished_by_id, prices)
+    for item in semifinished:
+        item.update(server.materialized_costs(semifinished_costs[item["id"]], server.SEMIFINISHED_COST_FIELDS))
+
+    recipes = []
+    for i in range(args.recipes):
+        components = [
+            {"type": "ingredient", "itemId": ingredient_id, "quantity": round(rng.uniform(0.05, 1), 3)}
+            for ingredient_id in rng.sample(ingredient_ids, rng.randint(3, 10))
+        ]
+        if semifinished:
+            components += [
+                {"type": "semifinished", "itemId": item["id"], "quantity": round(rng.uniform(0.1, 1.5), 3)}
+                for item in rng.sample(semifinished, min(len(semifinished), rng.randint(1, 4)))
+            ]
+        recipe = server.Recipe(
+            userId=user_id,
+            name=f"Торт {i}",
+            categoryId=rng.choice(categories)["id"] if categories else None,
+            description="Бісквіт, крем, ягоди",
+            laborCost=round(rng.uniform(50, 300), 2),
+            markup=rng.choice([20, 30, 40]),
+            components=components,
+        ).model_dump()
+        recipe.update(server.materialized_costs(
+            server.compute_recipe_cost(recipe, prices, semifinished_costs), server.RECIPE_COST_FIELDS
+        ))
+        recipes.append(recipe)
+
+    today = date.today()
+    orders = []
+    for i in range(args.orders):
+        client = rng.choice(clients)
+        due = today + timedelta(days=rng.randint(-3 * 365, 60))
+        created = datetime.combine(due, datetime.min.time(), timezone.utc) - timedelta(days=rng.randint(1, 30))
+        orders.append(server.Order(
+            userId=user_id,
+            clientId=client["id"],
+            client=server.client_snapshot(client),
+            item=rng.choice(recipes)["name"] if recipes else "Торт",
+            lines=[
+                {"recipeId": recipe["id"], "quantity": rng.randint(1, 3)}
+                for recipe in rng.sample(recipes, min(len(recipes), rng.randint(1, 3)))
+            ],
+            dueDate=due.isoformat(),
+            total=round(rng.uniform(200, 5000), 2),
+            status=rng.choice(STATUSES),
+            createdAt=created.isoformat(),
+        ).model_dump())
+
+    return {
+        "categories": categories,
+        "clients": [server.with_search_keys("clients", client) for client in clients],
+        "ingredients": [server.with_search_keys("ingredients", ingredient) for ingredient in ingredients],
+        "semifinished": semifinished,
+        "recipes": [server.with_search_keys("recipes", recipe) for recipe in recipes],
+        "orders": orders,
+    }
+
+
+async def seed(database, dataset: dict):
+    for collection, documents in dataset.items():
+        for batch in batches(documents):
+            await database[collection].insert_many([dict(document) for document in batch], ordered=False)
+
+
+def endpoints(dataset: dict, rng: random.Random) -> List[tuple]:
+    """(name, method, path factory, body factory) for every benchmarked call."""
+    today = date.today()
+    month_from = today.replace(day=1).isoformat()
+    month_to = (today.replace(day=1) + timedelta(days=31)).replace(day=1).isoformat()
+    year_from = today.replace(month=1, day=1).isoformat()
+    year_to = today.replace(month=12, day=31).isoformat()
+    recipe_ids = [recipe["id"] for recipe in dataset["recipes"]]
+    semifinished_ids = [item["id"] for item in dataset["semifinished"]]
+
+    def fixed(path: str) -> Callable[[], str]:
+        return lambda: path
+
+    return [
+        ("orders_page", "GET", fixed("/api/orders?limit=50"), None),
+        ("orders_1000", "GET", fixed("/api/orders?limit=1000"), None),
+        ("orders_month", "GET", fixed(f"/api/orders/range?from={month_from}&to={month_to}"), None),
+        ("orders_calendar_year", "GET",
+         fixed(f"/api/orders/calendar?from={year_from}&to={year_to}&granularity=month"), None),
+        ("orders_export_month", "GET",
+         fixed(f"/api/orders/export?format=ndjson&from={month_from}&to={month_to}"), None),
+        ("clients_page", "GET", fixed("/api/clients?limit=100"), None),
+        ("clients_stats_all", "GET", fixed("/api/clients?withStats=true"), None),
+        ("ingredients_page", "GET", fixed("/api/ingredients?limit=100"), None),
+        ("semifinished_all", "GET", fixed("/api/semifinished"), None),
+        ("recipes_page", "GET", fixed("/api/recipes?limit=100"), None),
+        ("recipe_calculate", "GET", lambda: f"/api/recipes/{rng.choice(recipe_ids)}/calculate", None),
+        ("semifinished_calculate", "GET",
+         lambda: f"/api/semifinished/{rng.choice(semifinished_ids)}/calculate", None),
+        ("recipes_calculate_10", "POST", fixed("/api/recipes/calculate"),
+         lambda: {"items": [{"recipeId": recipe_id, "quantity": 2} for recipe_id in rng.sample(recipe_ids, 10)]}),
+        ("bootstrap_catalog", "GET", fixed("/api/bootstrap?include=recipes,categories,semifinished"), None),
+        ("search_prefix", "GET", lambda: f"/api/search?q=торт {rng.randint(1, 99)}", None),
+        ("dashboard_month", "GET", fixed("/api/stats/dashboard?period=month"), None),
+        ("timeseries_year", "GET", fixed(f"/api/stats/timeseries?from={year_from}&to={year_to}&bucket=week"), None),
+        ("planning_month", "GET", fixed(f"/api/planning/requirements?from={month_from}&to={month_to}"), None),
+    ]
+
+
+def total_commands(server) -> Optional[int]:
+    return sum(server.metrics.commands.values())
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_endpoint(http, server, endpoint, requests: int, concurrency: int, count_commands: bool) -> dict:
+    name, method, path, body = endpoint
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def call():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await http.request(method, path(), json=body() if body else None)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    # One untimed call warms caches and surfaces broken endpoints early
+    await http.request(method, path(), json=body() if body else None)
+
+    commands_before = total_commands(server)
+    started = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    commands = total_commands(server) - commands_before
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "mongo_commands_per_request": round(commands / requests, 2) if count_commands else None,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict):
+    print(f"{'endpoint':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'mongo/req':>10} {'errors':>7}")
+    for name, result in results.items():
+        commands = result["mongo_commands_per_request"]
+        print(
+            f"{name:<24} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+            f"{result['throughput_rps']:>8.1f} {'n/a' if commands is None else commands:>10} {result['errors']:>7}"
+        )
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Print changes against a baseline; True when nothing regressed."""
+    ok = True
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} from {baseline.get('created')}:")
+    for name, result in results.items():
+        previous = baseline["endpoints"].get(name)
+        if previous is None:
+            continue
+        for metric in ("p95_ms", "mongo_commands_per_request"):
+            before, after = previous.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            regressed = change > threshold
+            ok = ok and not regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(f"  {name:<24} {metric:<27} {before:>9} -> {after:<9} {change:+6.1f}%{flag}")
+    return ok
+
+
+async def main():
+    args = parse_args()
+    in_memory = args.mongo_url == "memory"
+    os.environ["MONGO_URL"] = "mongodb://localhost:27017" if in_memory else args.mongo_url
+    os.environ["DB_NAME"] = args.db_name
+    server = importlib.import_module("server")
+
+    import httpx
+
+    if in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        server.db = AsyncMongoMockClient()[args.db_name]
+    database = server.db
+    rng = random.Random(args.seed)
+
+    await database.client.drop_database(args.db_name)
+    await server.run_migrations(database)
+
+    # Failing endpoints (e.g. operators mongomock lacks) count as errors instead of aborting
+    transport = httpx.ASGITransport(app=server.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as http:
+        response = await http.post("/api/auth/signup", json={
+            "name": "Benchmark", "email": f"bench-{uuid.uuid4().hex[:8]}@example.com", "password": "benchmark"
+        })
+        response.raise_for_status()
+        http.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        user_id = response.json()["user"]["id"]
+
+        started = time.perf_counter()
+        dataset = make_dataset(server, user_id, args, rng)
+        await seed(database, dataset)
+        await server.rebuild_daily_stats(database, user_id)
+        print(
+            f"Seeded {', '.join(f'{len(documents)} {name}' for name, documents in dataset.items())} "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        selected = set(args.only.split(",")) if args.only else None
+        results = {}
+        for endpoint in endpoints(dataset, rng):
+            if selected and endpoint[0] not in selected:
+                continue
+            results[endpoint[0]] = await run_endpoint(
+                http, server, endpoint, args.requests, args.concurrency, count_commands=not in_memory
+            )
+
+    if not args.keep:
+        await database.client.drop_database(args.db_name)
+
+    print_results(results)
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("save", "compare")},
+        "endpoints": results,
+    }
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"\nSaved baseline to {args.save}")
+    if args.compare:
+        if not compare(results, json.loads(args.compare.read_text()), args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for list response serialization.
+
+Compares FastAPI's default response_model path against the FAST_RESPONSES
+modes of server.list_response on synthetic recipes with nested ingredients
+and components, and reports CPU time per 1000 rows.
+
+    python benchmarks/serialization.py --rows 1000 --repeat 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "cake_bb_benchmark")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi import Response  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+import server  # noqa: E402
+
+
+def make_recipes(rows: int) -> List[dict]:
+    user_id = str(uuid.uuid4())
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "userId": user_id,
+            "name": f"Торт №{i}",
+            "categoryId": str(uuid.uuid4()),
+            "imageUrl": None,
+            "thumbnailUrl": None,
+            "description": "Бісквіт, крем, ягоди",
+            "laborCost": 150.0,
+            "markup": 30.0,
+            "ingredients": [{"ingredientId": str(uuid.uuid4()), "quantity": 0.25} for _ in range(4)],
+            "components": [
+                {"type": "ingredient" if j % 3 else "semifinished", "itemId": str(uuid.uuid4()), "quantity": 1.5}
+                for j in range(12)
+            ],
+            "recipeCost": 420.5,
+            "totalCost": 570.5,
+            "finalPrice": 741.65,
+        }
+        for i in range(rows)
+    ]
+
+
+async def default_path(documents: List[dict], field) -> bytes:
+    content = await serialize_response(field=field, response_content=documents)
+    return JSONResponse(content).body
+
+
+def measure(label: str, func, rows: int, repeat: int) -> float:
+    func()  # warm up
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    per_call = (time.process_time() - started) / repeat
+    per_thousand_ms = per_call / rows * 1000 * 1000
+    print(f"{label:<10} {per_thousand_ms:8.2f} ms CPU per 1000 rows")
+    return per_thousand_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    documents = make_recipes(args.rows)
+    field = create_response_field(name="response", type_=List[server.Recipe])
+    loop = asyncio.new_event_loop()
+
+    results = {
+        "default": measure(
+            "default", lambda: loop.run_until_complete(default_path(documents, field)), args.rows, args.repeat
+        ),
+        "validate": measure(
+            "validate",
+            lambda: server.list_response(documents, server.Recipe, Response(), mode="validate").body,
+            args.rows,
+            args.repeat,
+        ),
+        "trusted": measure(
+            "trusted",
+            lambda: server.list_response(documents, server.Recipe, Response(), mode="trusted").body,
+            args.rows,
+            args.repeat,
+        ),
+    }
+    loop.close()
+
+    for mode in ("validate", "trusted"):
+        saved = results["default"] - results[mode]
+        print(f"{mode} saves {saved:.2f} ms CPU per 1000 rows ({saved / results['default'] * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ const statusColors = {
 export default function CalendarPage() {
   const { t } = useTranslation();
   const [orders, setOrders] = useState([]);
+  const [monthCounts, setMonthCounts] = useState({});
   const [loading, setLoading] = useState(true);
   const [selectedDate, setSelectedDate] = useState(new Date());
   const [currentDate, setCurrentDate] = useState(new Date());
@@ -32,12 +33,30 @@ export default function CalendarPage() {
 
   useEffect(() => {
     fetchOrders();
-  }, []);
+  }, [currentDate, viewMode]);
+
+  const getViewRange = () => {
+    if (viewMode === 'day') {
+      return [currentDate, currentDate];
+    } else if (viewMode === 'week') {
+      return [startOfWeek(currentDate, { locale: uk }), endOfWeek(currentDate, { locale: uk })];
+    } else if (viewMode === 'month') {
+      return [startOfWeek(startOfMonth(currentDate), { locale: uk }), endOfWeek(endOfMonth(currentDate), { locale: uk })];
+    }
+    return [startOfYear(currentDate), endOfYear(currentDate)];
+  };
 
   const fetchOrders = async () => {
+    const [start, end] = getViewRange();
+    const params = { from: format(start, 'yyyy-MM-dd'), to: format(end, 'yyyy-MM-dd') };
     try {
-      const response = await axios.get('/orders');
-      setOrders(response.data);
+      if (viewMode === 'year') {
+        const response = await axios.get('/orders/calendar', { params: { ...params, granularity: 'month' } });
+        setMonthCounts(Object.fromEntries(response.data.map(bucket => [bucket.bucket, bucket.count])));
+      } else {
+        const response = await axios.get('/orders/range', { params });
+        setOrders(response.data);
+      }
     } catch (error) {
       toast.error(t('orders.errorLoad'));
     } finally {
@@ -55,14 +74,6 @@ export default function CalendarPage() {
     });
   };
 
-  const getOrdersForPeriod = (startDate, endDate) => {
-    return orders.filter(order => {
-      if (!order.dueDate) return false;
-      const orderDate = new Date(order.dueDate);
-      return orderDate >= startDate && orderDate <= endDate;
-    });
-  };
-
   const handleDateSelect = (date) => {
     setSelectedDate(date);
     setCurrentDate(date);
@@ -378,9 +389,7 @@ export default function CalendarPage() {
         </div>
         <div className="grid grid-cols-3 md:grid-cols-4 gap-4">
           {months.map((month) => {
-            const monthStart = startOfMonth(month);
-            const monthEnd = endOfMonth(month);
-            const monthOrders = getOrdersForPeriod(monthStart, monthEnd);
+            const monthCount = monthCounts[format(month, 'yyyy-MM')] || 0;
             
             return (
               <div
@@ -395,7 +404,7 @@ export default function CalendarPage() {
                   {format(month, 'LLLL', { locale: uk })}
                 </div>
                 <div className="text-center">
-                  <span className="text-2xl font-bold text-primary">{monthOrders.length}</span>
+                  <span className="text-2xl font-bold text-primary">{monthCount}</span>
                   <div className="text-xs text-muted-foreground">{t('orders.title')}</div>
                 </div>
               </div>
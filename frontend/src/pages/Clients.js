@@ -14,7 +14,6 @@ import { useTranslation } from 'react-i18next';
 export default function Clients() {
   const { t } = useTranslation();
   const [clients, setClients] = useState([]);
-  const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
   const [dialogOpen, setDialogOpen] = useState(false);
   const [formData, setFormData] = useState({ name: '', email: '', phone: '' });
@@ -27,12 +26,8 @@ export default function Clients() {
 
   const fetchData = async () => {
     try {
-      const [clientsRes, ordersRes] = await Promise.all([
-        axios.get('/clients'),
-        axios.get('/orders')
-      ]);
-      setClients(clientsRes.data);
-      setOrders(ordersRes.data);
+      const response = await axios.get('/clients', { params: { withStats: true } });
+      setClients(response.data);
     } catch (error) {
       toast.error(t('clients.errorLoad'));
     } finally {
@@ -91,10 +86,6 @@ export default function Clients() {
     setEditingId(null);
   };
 
-  const getClientOrderCount = (clientId) => {
-    return orders.filter(order => order.clientId === clientId).length;
-  };
-
   if (loading) {
     return (
       <div className="flex items-center justify-center h-64">
@@ -173,6 +164,7 @@ export default function Clients() {
                     <th className="px-4 py-3 text-left text-sm font-medium text-muted-foreground">{t('clients.client')}</th>
                     <th className="px-4 py-3 text-left text-sm font-medium text-muted-foreground">{t('clients.contacts')}</th>
                     <th className="px-4 py-3 text-left text-sm font-medium text-muted-foreground">{t('clients.orders')}</th>
+                    <th className="px-4 py-3 text-left text-sm font-medium text-muted-foreground">{t('clients.lifetimeValue')}</th>
                     <th className="px-4 py-3 text-left text-sm font-medium text-muted-foreground"></th>
                   </tr>
                 </thead>
@@ -207,7 +199,8 @@ export default function Clients() {
                           )}
                         </div>
                       </td>
-                      <td className="px-4 py-3 text-sm">{getClientOrderCount(client.id)}</td>
+                      <td className="px-4 py-3 text-sm">{client.orderCount}</td>
+                      <td className="px-4 py-3 text-sm font-medium">{client.lifetimeValue.toFixed(2)} грн</td>
                       <td className="px-4 py-3">
                         <DropdownMenu>
                           <DropdownMenuTrigger asChild>
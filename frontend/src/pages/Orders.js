@@ -22,6 +22,17 @@ const statusColors = {
   'Cancelled': 'bg-red-100 text-red-800 dark:bg-red-900 dark:text-red-200'
 };
 
+// Apply a created/updated/deleted change event to a list of documents
+const applyChange = (items, event) => {
+  if (event.action === 'deleted') {
+    return items.filter((item) => item.id !== event.id);
+  }
+  if (items.some((item) => item.id === event.id)) {
+    return items.map((item) => (item.id === event.id ? event.document : item));
+  }
+  return [event.document, ...items];
+};
+
 export default function Orders() {
   const { t } = useTranslation();
   
@@ -50,16 +61,58 @@ export default function Orders() {
     fetchData();
   }, []);
 
+  // Apply change events pushed by the server instead of refetching lists
+  useEffect(() => {
+    if (!localStorage.getItem('token') || typeof EventSource === 'undefined') return;
+    
+    const setters = { orders: setOrders, clients: setClients, recipes: setRecipes };
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+    
+    // The stream URL carries a short-lived stream token, so every
+    // (re)connect asks for a fresh one and refetches what it may have missed
+    const connect = async (reconnecting) => {
+      try {
+        const response = await axios.post('/events/token');
+        if (closed) return;
+        source = new EventSource(`${axios.defaults.baseURL}/events?token=${encodeURIComponent(response.data.token)}`);
+      } catch (error) {
+        if (!closed) retryTimer = setTimeout(() => connect(true), 5000);
+        return;
+      }
+      if (reconnecting) fetchData();
+      source.onmessage = (message) => {
+        const event = JSON.parse(message.data);
+        const setList = setters[event.collection];
+        if (event.action === 'resync' || (setList && !event.id)) {
+          fetchData();
+        } else if (setList) {
+          setList((items) => applyChange(items, event));
+        }
+      };
+      source.onerror = () => {
+        source.close();
+        if (!closed) retryTimer = setTimeout(() => connect(true), 5000);
+      };
+    };
+    connect(false);
+    
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, []);
+
   const fetchData = async () => {
     try {
-      const [ordersRes, clientsRes, recipesRes] = await Promise.all([
-        axios.get('/orders'),
-        axios.get('/clients'),
-        axios.get('/recipes')
-      ]);
-      setOrders(ordersRes.data);
-      setClients(clientsRes.data);
-      setRecipes(recipesRes.data);
+      const response = await axios.get('/bootstrap', {
+        params: { include: 'orders,clients,recipes' }
+      });
+      setOrders(response.data.orders);
+      setClients(response.data.clients);
+      setRecipes(response.data.recipes);
     } catch (error) {
       toast.error(t('orders.errorLoad'));
     } finally {
@@ -69,12 +122,19 @@ export default function Orders() {
 
   const handleSubmit = async (e) => {
     e.preventDefault();
+    const { orderRecipes, ...orderData } = formData;
+    const payload = {
+      ...orderData,
+      lines: orderRecipes
+        .filter(orderRecipe => orderRecipe.recipeId && orderRecipe.quantity > 0)
+        .map(orderRecipe => ({ recipeId: orderRecipe.recipeId, quantity: orderRecipe.quantity }))
+    };
     try {
       if (isEditing && selectedOrder) {
-        await axios.put(`/orders/${selectedOrder.id}`, formData);
+        await axios.put(`/orders/${selectedOrder.id}`, payload);
         toast.success(t('orders.updated'));
       } else {
-        await axios.post('/orders', formData);
+        await axios.post('/orders', payload);
         toast.success(t('orders.created'));
       }
       setDialogOpen(false);
@@ -88,9 +148,9 @@ export default function Orders() {
 
   const handleStatusChange = async (orderId, newStatus) => {
     try {
-      await axios.put(`/orders/${orderId}`, { status: newStatus });
+      const response = await axios.put(`/orders/${orderId}`, { status: newStatus });
       toast.success(t('orders.statusUpdated'));
-      fetchData();
+      setOrders((items) => applyChange(items, { action: 'updated', id: orderId, document: response.data }));
     } catch (error) {
       toast.error(t('orders.error'));
     }
@@ -137,15 +197,16 @@ export default function Orders() {
   };
 
   const calculateOrderTotal = async (orderRecipes) => {
+    const items = orderRecipes
+      .filter(orderRecipe => orderRecipe.recipeId && orderRecipe.quantity > 0)
+      .map(orderRecipe => ({ recipeId: orderRecipe.recipeId, quantity: orderRecipe.quantity }));
     let total = 0;
-    for (const orderRecipe of orderRecipes) {
-      if (orderRecipe.recipeId && orderRecipe.quantity > 0) {
-        try {
-          const response = await axios.get(`/recipes/${orderRecipe.recipeId}/calculate`);
-          total += response.data.finalPrice * orderRecipe.quantity;
-        } catch (error) {
-          console.error('Error calculating recipe price:', error);
-        }
+    if (items.length > 0) {
+      try {
+        const response = await axios.post('/recipes/calculate', { items });
+        total = response.data.total;
+      } catch (error) {
+        console.error('Error calculating recipe price:', error);
       }
     }
     setFormData(prev => ({ ...prev, total: total }));
@@ -177,7 +238,7 @@ export default function Orders() {
       dueDate: order.dueDate?.substring(0, 16),
       total: order.total,
       notes: order.notes || '',
-      orderRecipes: []
+      orderRecipes: (order.lines || []).map(line => ({ ...line }))
     });
     setIsEditing(true);
     setDetailsOpen(false);
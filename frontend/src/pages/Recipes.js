@@ -12,6 +12,8 @@ import { Plus, MoreVertical, Copy, Trash2 } from 'lucide-react';
 import { toast } from 'sonner';
 import { useTranslation } from 'react-i18next';
 
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+
 export default function Recipes() {
   const { t } = useTranslation();
   const [recipes, setRecipes] = useState([]);
@@ -40,16 +42,13 @@ export default function Recipes() {
 
   const fetchData = async () => {
     try {
-      const [recipesRes, ingRes, semiRes, catRes] = await Promise.all([
-        axios.get('/recipes'),
-        axios.get('/ingredients'),
-        axios.get('/semifinished'),
-        axios.get('/categories')
-      ]);
-      setRecipes(recipesRes.data);
-      setIngredients(ingRes.data);
-      setSemiProducts(semiRes.data);
-      setCategories(catRes.data);
+      const response = await axios.get('/bootstrap', {
+        params: { include: 'recipes,ingredients,semifinished,categories' }
+      });
+      setRecipes(response.data.recipes);
+      setIngredients(response.data.ingredients);
+      setSemiProducts(response.data.semifinished);
+      setCategories(response.data.categories);
     } catch (err) {
       toast.error(t('common.error'));
     } finally {
@@ -57,6 +56,26 @@ export default function Recipes() {
     }
   };
 
+  // The grid only ever loads the small thumbnail; the original stays on the server
+  const handleImageUpload = async (e) => {
+    const file = e.target.files[0];
+    if (!file) return;
+    try {
+      const upload = new FormData();
+      upload.append('file', file);
+      const response = await axios.post('/upload/recipe', upload, {
+        headers: { 'Content-Type': 'multipart/form-data' }
+      });
+      setFormData((prev) => ({
+        ...prev,
+        imageUrl: response.data.imageUrl,
+        thumbnailUrl: response.data.thumbnails['200'] || null
+      }));
+    } catch (err) {
+      toast.error(err.response?.data?.detail || t('common.error'));
+    }
+  };
+
   const openEditDialog = (recipe) => {
     setIsEditing(true);
     setEditingId(recipe._id);
@@ -306,12 +325,24 @@ export default function Recipes() {
                 <tbody className="divide-y">
                   {filteredRecipes.map((recipe) => {
                     const category = categories.find(c => c.id === recipe.categoryId);
-                    const cost = parseFloat(computeCost(recipe.components || []));
+                    const cost = parseFloat(recipe.recipeCost != null ? recipe.recipeCost.toFixed(2) : computeCost(recipe.components || []));
                     const labor = recipe.laborCost || 0;
                     const total = (cost + labor).toFixed(2);
                     return (
                       <tr key={recipe._id} className="hover:bg-muted/50 transition-colors">
-                        <td className="p-4">{recipe.name}</td>
+                        <td className="p-4">
+                          <div className="flex items-center gap-3">
+                            {recipe.thumbnailUrl && (
+                              <img
+                                src={`${BACKEND_URL}${recipe.thumbnailUrl}`}
+                                alt={recipe.name}
+                                loading="lazy"
+                                className="h-10 w-10 rounded object-cover"
+                              />
+                            )}
+                            {recipe.name}
+                          </div>
+                        </td>
                         <td className="p-4">
                           {category ? (
                             <span 
@@ -391,6 +422,10 @@ export default function Recipes() {
                   </SelectContent>
                 </Select>
               </div>
+              <div className="space-y-2">
+                <Label htmlFor="image">{t('recipes.image')}</Label>
+                <Input id="image" type="file" accept="image/*" onChange={handleImageUpload} />
+              </div>
               <div className="space-y-2">
                 <Label htmlFor="description">{t('orders.notes')}</Label>
                 <Textarea
@@ -22,7 +22,8 @@ export default function Semifinished() {
   const [formData, setFormData] = useState({
     name: '',
     unit: 'кг',
-    ingredients: [{ ingredientId: '', quantity: 0 }]
+    ingredients: [{ ingredientId: '', quantity: 0 }],
+    components: []
   });
 
   useEffect(() => {
@@ -46,11 +47,12 @@ export default function Semifinished() {
 
   const openEditDialog = (sp) => {
     setIsEditing(true);
-    setEditingId(sp._id);
+    setEditingId(sp.id);
     setFormData({
       name: sp.name,
       unit: sp.unit,
-      ingredients: sp.ingredients || [{ ingredientId: '', quantity: 0 }]
+      ingredients: sp.ingredients || [{ ingredientId: '', quantity: 0 }],
+      components: sp.components || []
     });
     setDialogOpen(true);
   };
@@ -69,7 +71,7 @@ export default function Semifinished() {
       resetForm();
       fetchData();
     } catch (err) {
-      toast.error(t('common.error'));
+      toast.error(err.response?.data?.detail || t('common.error'));
     }
   };
 
@@ -87,7 +89,7 @@ export default function Semifinished() {
   };
 
   const resetForm = () => {
-    setFormData({ name: '', unit: 'кг', ingredients: [{ ingredientId: '', quantity: 0 }] });
+    setFormData({ name: '', unit: 'кг', ingredients: [{ ingredientId: '', quantity: 0 }], components: [] });
     setIsEditing(false);
     setEditingId(null);
   };
@@ -114,10 +116,32 @@ export default function Semifinished() {
     });
   };
 
+  const addComponentRow = () => {
+    setFormData(prev => ({
+      ...prev,
+      components: [...prev.components, { type: 'semifinished', itemId: '', quantity: 0 }]
+    }));
+  };
+
+  const removeComponentRow = (index) => {
+    setFormData(prev => ({
+      ...prev,
+      components: prev.components.filter((_, i) => i !== index)
+    }));
+  };
+
+  const updateComponentRow = (index, field, value) => {
+    setFormData(prev => {
+      const newComponents = [...prev.components];
+      newComponents[index] = { ...newComponents[index], [field]: value };
+      return { ...prev, components: newComponents };
+    });
+  };
+
   const computeCost = (spIngredients) => {
     let total = 0;
     for (const ing of spIngredients) {
-      const ingredient = ingredients.find(i => i._id === ing.ingredientId);
+      const ingredient = ingredients.find(i => i.id === ing.ingredientId);
       if (ingredient) {
         total += ingredient.price * ing.quantity;
       }
@@ -163,10 +187,10 @@ export default function Semifinished() {
                 </thead>
                 <tbody className="divide-y">
                   {semiProducts.map((sp) => (
-                    <tr key={sp._id} className="hover:bg-muted/50 transition-colors">
+                    <tr key={sp.id} className="hover:bg-muted/50 transition-colors">
                       <td className="p-4">{sp.name}</td>
                       <td className="p-4">{sp.unit}</td>
-                      <td className="p-4">{computeCost(sp.ingredients)} грн</td>
+                      <td className="p-4">{sp.ingredientsCost != null ? sp.ingredientsCost.toFixed(2) : computeCost(sp.ingredients)} грн</td>
                       <td className="p-4 text-right">
                         <DropdownMenu>
                           <DropdownMenuTrigger asChild>
@@ -242,7 +266,7 @@ export default function Semifinished() {
                         </SelectTrigger>
                         <SelectContent>
                           {ingredients.map(i => (
-                            <SelectItem key={i._id} value={i._id}>{i.name}</SelectItem>
+                            <SelectItem key={i.id} value={i.id}>{i.name}</SelectItem>
                           ))}
                         </SelectContent>
                       </Select>
@@ -274,6 +298,53 @@ export default function Semifinished() {
                 </Button>
               </div>
 
+              <div className="space-y-2">
+                <Label>{t('semifinished.nested')}</Label>
+                {formData.components.map((component, idx) => (
+                  <div key={idx} className="flex gap-2 items-end">
+                    <div className="flex-1">
+                      <Label htmlFor={`sf-${idx}`}>{t('recipes.semifinished')}</Label>
+                      <Select
+                        value={component.itemId}
+                        onValueChange={(val) => updateComponentRow(idx, 'itemId', val)}
+                      >
+                        <SelectTrigger>
+                          <SelectValue placeholder={t('recipes.selectSemifinished')} />
+                        </SelectTrigger>
+                        <SelectContent>
+                          {semiProducts.filter(sp => sp.id !== editingId).map(sp => (
+                            <SelectItem key={sp.id} value={sp.id}>{sp.name}</SelectItem>
+                          ))}
+                        </SelectContent>
+                      </Select>
+                    </div>
+                    <div className="w-32">
+                      <Label htmlFor={`sf-qty-${idx}`}>{t('semifinished.quantity')}</Label>
+                      <Input
+                        id={`sf-qty-${idx}`}
+                        type="number"
+                        step="0.01"
+                        value={component.quantity}
+                        onChange={(e) => updateComponentRow(idx, 'quantity', parseFloat(e.target.value))}
+                        required
+                      />
+                    </div>
+                    <Button
+                      type="button"
+                      variant="ghost"
+                      size="icon"
+                      onClick={() => removeComponentRow(idx)}
+                    >
+                      <Trash2 className="h-4 w-4" />
+                    </Button>
+                  </div>
+                ))}
+                <Button type="button" variant="outline" onClick={addComponentRow}>
+                  <Plus className="mr-2 h-4 w-4" />
+                  {t('semifinished.addNested')}
+                </Button>
+              </div>
+
               <DialogFooter className={isEditing ? "flex justify-between" : ""}>
                 {isEditing && (
                   <Button
@@ -0,0 +1,56 @@
+"""
+Shared test setup. The backend is imported as ``server``; tests that need a
+database without caring which get the ``mock_db`` fixture, an in-memory
+mongomock database installed as ``server.db``. ``api`` is an HTTP client for
+the app, signed in as ``user``.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "cake_bb_test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+async def mock_is_replica_set(database) -> bool:
+    # mongomock has no hello command and no change streams
+    return False
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    database = mongomock_motor.AsyncMongoMockClient()["cake_bb_test"]
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "is_replica_set", mock_is_replica_set)
+    # Process-wide caches would otherwise carry state between tests
+    monkeypatch.setattr(server, "cost_cache", server.CostCache(server.COST_CACHE_MAX_ENTRIES))
+    monkeypatch.setattr(server, "user_cache", server.UserCache(server.USER_CACHE_MAX_SIZE, server.USER_CACHE_TTL_SECONDS))
+    return database
+
+
+@pytest.fixture
+def user(mock_db):
+    user = server.User(name="Test", email="test@example.com")
+    asyncio.run(mock_db.users.insert_one(user.model_dump()))
+    return user
+
+
+@pytest.fixture
+def api(user):
+    """Unopened client; use it as ``async with api as client`` inside the
+    test's event loop. The app's lifespan does not run."""
+    token = server.create_access_token({"sub": user.id})
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=server.app),
+        base_url="http://test/api",
+        headers={"Authorization": f"Bearer {token}"}
+    )
@@ -0,0 +1,74 @@
+"""
+Authentication tests: the authenticated user cache and password hashing
+backpressure. Runs against mongomock.
+"""
+
+import asyncio
+import threading
+
+import server
+
+
+def test_authenticated_user_is_cached(api, mock_db, user):
+    async def check():
+        async with api as client:
+            assert (await client.get("/auth/me")).json()["name"] == "Test"
+            # Writes that bypass the API are only seen once the entry lapses
+            await mock_db.users.update_one({"id": user.id}, {"$set": {"name": "Stale"}})
+            assert (await client.get("/auth/me")).json()["name"] == "Test"
+        assert server.user_cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+    asyncio.run(check())
+
+
+def test_profile_update_invalidates_cached_user(api):
+    async def check():
+        async with api as client:
+            await client.get("/auth/me")
+            response = await client.put("/auth/me", json={"name": "Renamed", "theme": "dark"})
+            assert response.status_code == 200
+            me = (await client.get("/auth/me")).json()
+            assert (me["name"], me["theme"]) == ("Renamed", "dark")
+
+    asyncio.run(check())
+
+
+def test_cache_expires_and_evicts_least_recently_used():
+    cache = server.UserCache(2, 60)
+    users = [server.User(name=name, email=f"{name}@example.com") for name in ("a", "b", "c")]
+    for cached in users:
+        cache.set(cached)
+    assert cache.get(users[0].id) is None
+    assert cache.get(users[2].id) is users[2]
+
+    cache.ttl_seconds = -1
+    cache.set(users[1])
+    assert cache.get(users[1].id) is None
+
+
+def test_saturated_password_hasher_fails_fast(api, mock_db, user, monkeypatch):
+    hasher = server.PasswordHasher(1, 1)
+    monkeypatch.setattr(server, "password_hasher", hasher)
+    release = threading.Event()
+
+    async def check():
+        # Never verified: the request is turned away first
+        await mock_db.users.update_one({"id": user.id}, {"$set": {"password": "unchecked"}})
+        # One hash in flight fills the queue
+        blocked = asyncio.create_task(hasher.run(release.wait))
+        await asyncio.sleep(0.01)
+        try:
+            async with api as client:
+                response = await client.post("/auth/login", json={"email": "test@example.com", "password": "secret"})
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "1"
+        finally:
+            release.set()
+            await blocked
+        assert hasher.stats()["rejected"] == 1
+        assert hasher.stats()["pending"] == 0
+
+    try:
+        asyncio.run(check())
+    finally:
+        hasher.shutdown()
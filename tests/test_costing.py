@@ -0,0 +1,155 @@
+"""
+Costing, cost cache and production planning tests. Most exercise pure
+functions; cached costing runs against mongomock.
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+import server
+
+
+def ingredient(item_id: str, quantity: float) -> dict:
+    return {"type": "ingredient", "itemId": item_id, "quantity": quantity}
+
+
+def semifinished(item_id: str, quantity: float) -> dict:
+    return {"type": "semifinished", "itemId": item_id, "quantity": quantity}
+
+
+# cream <- sponge <- layer: three levels of nesting
+CATALOG = {
+    "layer": {"id": "layer", "components": [semifinished("sponge", 2), ingredient("sugar", 0.1)], "laborCost": 5},
+    "sponge": {"id": "sponge", "components": [semifinished("cream", 0.5), ingredient("flour", 0.2)], "laborCost": 1},
+    "cream": {"id": "cream", "ingredients": [{"ingredientId": "butter", "quantity": 0.25}], "laborCost": 2},
+}
+PRICES = {"sugar": 30.0, "flour": 20.0, "butter": 200.0}
+
+
+def test_topological_order_puts_contents_first():
+    order, cyclic = server.topological_order(CATALOG)
+    assert cyclic == []
+    assert order.index("cream") < order.index("sponge") < order.index("layer")
+
+
+def test_topological_order_ignores_missing_children():
+    order, cyclic = server.topological_order({"a": {"components": [semifinished("gone", 1)]}})
+    assert (order, cyclic) == (["a"], [])
+
+
+def test_topological_order_reports_cycles():
+    catalog = {
+        "a": {"components": [semifinished("b", 1)]},
+        "b": {"components": [semifinished("a", 1)]},
+        "top": {"components": [semifinished("a", 1)]},
+        "plain": {"components": [ingredient("sugar", 1)]},
+    }
+    order, cyclic = server.topological_order(catalog)
+    assert order == ["plain"]
+    assert sorted(cyclic) == ["a", "b", "top"]
+
+
+def test_topological_order_reports_self_reference():
+    _, cyclic = server.topological_order({"a": {"components": [semifinished("a", 1)]}})
+    assert cyclic == ["a"]
+
+
+def test_nested_semifinished_costs():
+    costs = server.compute_semifinished_costs(CATALOG, PRICES)
+    # cream: 0.25 * 200 + 2 labor
+    assert costs["cream"]["totalCost"] == pytest.approx(52)
+    # sponge: 0.5 * 52 + 0.2 * 20 + 1 labor
+    assert costs["sponge"]["ingredientsCost"] == pytest.approx(30)
+    assert costs["sponge"]["totalCost"] == pytest.approx(31)
+    # layer: 2 * 31 + 0.1 * 30 + 5 labor
+    assert costs["layer"]["totalCost"] == pytest.approx(70)
+
+
+def test_recipe_cost_includes_nested_semifinished_and_markup():
+    costs = server.compute_semifinished_costs(CATALOG, PRICES)
+    recipe = {"components": [semifinished("layer", 2), ingredient("sugar", 1)], "laborCost": 10, "markup": 50}
+    cost = server.compute_recipe_cost(recipe, PRICES, costs)
+    assert cost["recipeCost"] == pytest.approx(170)
+    assert cost["totalCost"] == pytest.approx(180)
+    assert cost["finalPrice"] == pytest.approx(270)
+
+
+def test_cost_cache_invalidation_cascades_to_dependents():
+    cache = server.CostCache(100)
+    graph = cache.graph("user")
+    graph.store(("semifinished", "cream"), {"totalCost": 52}, {("ingredient", "butter")})
+    graph.store(("semifinished", "sponge"), {"totalCost": 31}, {("semifinished", "cream"), ("ingredient", "flour")})
+    graph.store(("recipe", "cake"), {"totalCost": 70}, {("semifinished", "sponge")})
+    graph.store(("recipe", "cookie"), {"totalCost": 3}, {("ingredient", "flour")})
+    generation = graph.generation
+
+    cache.invalidate("user", "ingredient", "butter")
+
+    assert graph.generation == generation + 1
+    assert graph.get(("semifinished", "cream")) is None
+    assert graph.get(("semifinished", "sponge")) is None
+    assert graph.get(("recipe", "cake")) is None
+    assert graph.get(("recipe", "cookie")) == {"totalCost": 3}
+    # Dropped nodes no longer hang off the dependencies they shared
+    assert graph.dependents[("ingredient", "flour")] == {("recipe", "cookie")}
+
+
+def test_cost_cache_invalidation_is_per_user():
+    cache = server.CostCache(100)
+    cache.graph("a").store(("recipe", "cake"), {"totalCost": 1}, {("ingredient", "flour")})
+    cache.graph("b").store(("recipe", "cake"), {"totalCost": 2}, {("ingredient", "flour")})
+
+    cache.invalidate("a", "ingredient", "flour")
+    cache.invalidate("missing", "ingredient", "flour")
+
+    assert cache.graph("a").get(("recipe", "cake")) is None
+    assert cache.graph("b").get(("recipe", "cake")) == {"totalCost": 2}
+
+
+def test_cost_cache_evicts_least_recently_used_users():
+    cache = server.CostCache(2)
+    for user_id in ("a", "b", "c"):
+        cache.graph(user_id).store(("recipe", "cake"), {"totalCost": 1}, set())
+    cache.evict()
+    assert list(cache._users) == ["b", "c"]
+
+
+def test_cached_costs_follow_writes_from_other_workers(mock_db):
+    async def check(database):
+        await database.ingredients.insert_one({"id": "flour", "userId": "u", "name": "Борошно", "unit": "кг", "price": 20.0})
+        await database.recipes.insert_one({"id": "bread", "userId": "u", "name": "Хліб", "components": [ingredient("flour", 0.5)]})
+
+        costs = await server.get_recipe_costs("u", ["bread"])
+        assert costs["bread"]["recipeCost"] == pytest.approx(10)
+        assert server.cost_cache.graph("u").get(("recipe", "bread")) is not None
+
+        # Another worker's write never reaches this process's cache directly
+        await database.ingredients.update_one({"id": "flour"}, {"$set": {"price": 30.0}})
+        assert (await server.get_recipe_costs("u", ["bread"]))["bread"]["recipeCost"] == pytest.approx(10)
+        await server.bump_collection_version("u", "ingredients")
+        assert (await server.get_recipe_costs("u", ["bread"]))["bread"]["recipeCost"] == pytest.approx(15)
+
+    asyncio.run(check(mock_db))
+
+
+def test_ingredient_requirements_expand_nested_semifinished():
+    recipes = [
+        {"ingredients": [{"ingredientId": "sugar", "quantity": 1}], "components": [semifinished("layer", 1)]},
+        {"components": [ingredient("flour", 0.5), semifinished("cream", 2)]},
+    ]
+    required, ingredient_ids = server.ingredient_requirements(recipes, np.array([3.0, 4.0]), CATALOG)
+    totals = dict(zip(ingredient_ids, required))
+
+    # 3 layers -> 6 sponges -> 3 creams; the second recipe adds 8 creams
+    assert totals["sugar"] == pytest.approx(3 * 1 + 3 * 0.1)
+    assert totals["flour"] == pytest.approx(4 * 0.5 + 6 * 0.2)
+    assert totals["butter"] == pytest.approx((3 + 8) * 0.25)
+
+
+def test_ingredient_requirements_without_semifinished():
+    recipes = [{"components": [ingredient("flour", 0.5)]}, {"components": [ingredient("flour", 1)]}]
+    required, ingredient_ids = server.ingredient_requirements(recipes, np.array([2.0, 0.0]), {})
+    assert ingredient_ids == ["flour"]
+    assert required.tolist() == [1.0]
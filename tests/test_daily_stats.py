@@ -0,0 +1,126 @@
+"""
+Daily order rollup tests, run against mongomock.
+"""
+
+import asyncio
+
+import server
+
+
+def order(order_id: str, status: str = "New", total: float = 10.0, revision: int = 0) -> dict:
+    return {
+        "id": order_id, "userId": "u", "clientId": "c1", "status": status, "total": total,
+        "createdAt": "2026-03-01T10:00:00+00:00", "statsRevision": revision,
+    }
+
+
+async def rollup(database, day: str = "2026-03-01") -> dict:
+    return await database.daily_stats.find_one({"userId": "u", "day": day}, {"_id": 0})
+
+
+def test_rollup_deltas_add_and_remove_orders():
+    deltas = {}
+    order = {"userId": "u", "createdAt": "2026-03-01T10:00:00+00:00", "status": "Ready", "total": 100.0}
+    server.rollup_deltas(order, 1, deltas)
+    server.rollup_deltas({**order, "total": 50.0}, 1, deltas)
+    assert deltas == {("u", "2026-03-01"): {
+        "count": 2, "total": 150.0, "statuses.Ready.count": 2, "statuses.Ready.total": 150.0,
+    }}
+
+    # A status change takes the order out of one bucket and into another
+    server.rollup_deltas(order, -1, deltas)
+    server.rollup_deltas({**order, "status": "Delivered"}, 1, deltas)
+    inc = deltas[("u", "2026-03-01")]
+    assert inc["count"] == 2
+    assert inc["statuses.Ready.count"] == 1
+    assert inc["statuses.Delivered.total"] == 100.0
+
+
+def test_rollup_deltas_pool_unknown_statuses():
+    deltas = {}
+    server.rollup_deltas({"userId": "u", "createdAt": "2026-03-01T10:00:00+00:00", "status": "$where", "total": None}, 1, deltas)
+    server.rollup_deltas({"userId": "u", "createdAt": "2026-03-01T11:00:00+00:00"}, 1, deltas)
+    assert deltas[("u", "2026-03-01")] == {
+        "count": 2, "total": 0,
+        "statuses.Other.count": 1, "statuses.Other.total": 0,
+        "statuses.New.count": 1, "statuses.New.total": 0,
+    }
+
+
+def test_order_writes_increment_rollups(mock_db):
+    async def check(database):
+        await server.update_daily_stats(after=order("o1"))
+        await server.update_daily_stats(before=order("o1"), after=order("o1", "Delivered", revision=1))
+        assert await rollup(database) == {
+            "userId": "u", "day": "2026-03-01", "count": 1, "total": 10.0,
+            "statuses": {"New": {"count": 0, "total": 0.0}, "Delivered": {"count": 1, "total": 10.0}},
+        }
+
+    asyncio.run(check(mock_db))
+
+
+def test_order_writes_queue_on_rebuilding_rollups(mock_db):
+    async def check(database):
+        await server.run_migrations(database)
+        await database.daily_stats.insert_one({"userId": "u", "day": "2026-03-01", "count": 5, "rebuilding": True})
+
+        await server.update_daily_stats(after=order("o1"))
+        await server.update_daily_stats(before=order("o2", revision=3))
+
+        stored = await rollup(database)
+        assert stored["count"] == 5
+        assert stored["pending"] == [
+            {"orderId": "o1", "statsRevision": 0, "order": server.rollup_state(order("o1"))},
+            {"orderId": "o2", "statsRevision": 4, "order": None},
+        ]
+
+    asyncio.run(check(mock_db))
+
+
+def test_rebuild_applies_changes_queued_during_the_scan(mock_db):
+    async def check(database):
+        await server.run_migrations(database)
+        await database.users.insert_one({"id": "u"})
+        # The scan sees o1 and o2 as stored; o3 was created after the scan passed it
+        await database.orders.insert_many([order("o1", revision=1), order("o2", revision=1), order("gone")])
+        await database.orders.delete_one({"id": "gone"})
+        await database.daily_stats.insert_one({"userId": "u", "day": "2026-03-01", "count": 99, "rebuilding": True, "pending": [
+            # Already reflected in the scanned o1
+            {"orderId": "o1", "statsRevision": 1, "order": server.rollup_state(order("o1", "Ready", 50.0, 1))},
+            # Newer than the scanned o2
+            {"orderId": "o2", "statsRevision": 2, "order": server.rollup_state(order("o2", "Delivered", 20.0, 2))},
+            {"orderId": "o3", "statsRevision": 0, "order": server.rollup_state(order("o3"))},
+            {"orderId": "gone", "statsRevision": 1, "order": None},
+        ]})
+        await database.daily_stats.insert_one({"userId": "u", "day": "2026-02-01", "count": 1})
+
+        await server.rebuild_daily_stats(database, "u")
+
+        assert await rollup(database) == {
+            "userId": "u", "day": "2026-03-01", "count": 3, "total": 40.0,
+            "statuses": {"New": {"count": 2, "total": 20.0}, "Delivered": {"count": 1, "total": 20.0}},
+        }
+        # Days without orders, including the ones flagged for new orders, are gone
+        assert await database.daily_stats.count_documents({}) == 1
+
+        # With the rebuild over, writes increment again
+        await server.update_daily_stats(after=order("o4"))
+        assert (await rollup(database))["count"] == 4
+
+    asyncio.run(check(mock_db))
+
+
+def test_migrations_wait_for_a_running_migration(mock_db, monkeypatch):
+    monkeypatch.setattr(server, "LOCK_POLL_SECONDS", 0.01)
+
+    async def check(database):
+        assert await server.acquire_lock(database, "migrations", 60)
+        waiting = asyncio.create_task(server.run_migrations(database))
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+        assert await database.schema_migrations.count_documents({}) == 0
+
+        await server.release_lock(database, "migrations")
+        assert await waiting == [version for version, _, _ in server.MIGRATIONS]
+
+    asyncio.run(check(mock_db))
@@ -0,0 +1,52 @@
+"""
+Dashboard stats tests, run against mongomock.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+
+
+def test_dashboard_stats(api, user, mock_db):
+    now = datetime.now(timezone.utc)
+
+    def order(number: int, status: str, total: float, age_days: int, due: str) -> dict:
+        return {
+            "id": f"o{number}", "userId": user.id, "clientId": "c1", "client": {"id": "c1", "name": "Олена"},
+            "item": "Торт", "lines": [], "dueDate": due, "total": total, "status": status, "notes": "",
+            "createdAt": (now - timedelta(days=age_days)).isoformat(),
+        }
+
+    orders = [
+        order(1, "Delivered", 100.0, 2, "2026-01-01"),
+        order(2, "Delivered", 50.0, 60, "2026-01-02"),
+        order(3, "New", 30.0, 1, "2026-03-05"),
+        order(4, "In Progress", 20.0, 10, "2026-03-01"),
+        order(5, "Ready", 10.0, 3, "2026-03-03"),
+        order(6, "Cancelled", 5.0, 1, "2026-02-01"),
+    ]
+
+    async def check():
+        await server.run_migrations(mock_db)
+        await mock_db.orders.insert_many([dict(item) for item in orders])
+        for item in orders:
+            await server.update_daily_stats(after=item)
+        await mock_db.clients.insert_many([
+            {"id": "c1", "userId": user.id, "name": "Олена", "createdAt": (now - timedelta(days=90)).isoformat()},
+            {"id": "c2", "userId": user.id, "name": "Іван", "createdAt": (now - timedelta(days=5)).isoformat()},
+            {"id": "c3", "userId": "someone else", "name": "Петро", "createdAt": now.isoformat()},
+        ])
+
+        async with api as client:
+            month = (await client.get("/stats/dashboard")).json()
+            year = (await client.get("/stats/dashboard?period=year")).json()
+
+        assert month["totalRevenue"] == 100.0
+        assert year["totalRevenue"] == 150.0
+        assert (month["totalClients"], month["newClients"]) == (2, 1)
+        assert month["activeOrders"] == 2
+        assert month["recentActivities"] == 4
+        assert [item["id"] for item in month["upcomingOrders"]] == ["o4", "o5", "o3"]
+
+    asyncio.run(check())
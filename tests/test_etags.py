@@ -0,0 +1,59 @@
+"""
+Conditional list request tests: ETags follow the collection versions and a
+matching If-None-Match gets a 304. Runs against mongomock.
+"""
+
+import asyncio
+
+import server
+
+
+def test_unchanged_list_is_not_modified(api):
+    async def check():
+        async with api as client:
+            first = await client.get("/ingredients")
+            assert first.status_code == 200
+            etag = first.headers["ETag"]
+
+            cached = await client.get("/ingredients", headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.content == b""
+            assert cached.headers["ETag"] == etag
+
+            # Other queries of the same collection are other representations
+            paged = await client.get("/ingredients", params={"limit": 1}, headers={"If-None-Match": etag})
+            assert paged.status_code == 200
+
+    asyncio.run(check())
+
+
+def test_writes_change_the_list_etag(api):
+    async def check():
+        async with api as client:
+            etag = (await client.get("/ingredients")).headers["ETag"]
+            created = await client.post("/ingredients", json={"name": "Борошно", "unit": "кг", "price": 20})
+            assert created.status_code == 200
+
+            response = await client.get("/ingredients", headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert response.headers["ETag"] != etag
+            assert [item["name"] for item in response.json()] == ["Борошно"]
+
+    asyncio.run(check())
+
+
+def test_etag_is_not_shared_between_users(api, mock_db):
+    other = server.User(name="Other", email="other@example.com")
+
+    async def check():
+        await mock_db.users.insert_one(other.model_dump())
+        async with api as client:
+            etag = (await client.get("/ingredients")).headers["ETag"]
+            other_token = server.create_access_token({"sub": other.id})
+            response = await client.get(
+                "/ingredients",
+                headers={"If-None-Match": etag, "Authorization": f"Bearer {other_token}"}
+            )
+            assert response.status_code == 200
+
+    asyncio.run(check())
@@ -0,0 +1,108 @@
+"""
+Change event tests: stream tokens, the SSE stream and the change stream
+watcher. Runs without a database except where a user must exist.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import PyMongoError
+
+import server
+
+
+class FailingDatabase:
+    """Stands in for a database whose change stream opens and then fails."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    def watch(self, *args, **kwargs):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        assert server.event_hub.external
+        raise self.error
+
+
+def test_events_token_is_scoped_to_the_stream(api, user):
+    async def check():
+        async with api as client:
+            response = await client.post("/events/token")
+            assert response.status_code == 200
+            token = response.json()["token"]
+
+            # A stream token cannot stand in for the session
+            response = await client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 401
+
+        assert (await server.get_event_user(token=token, credentials=None)).id == user.id
+
+    asyncio.run(check())
+
+
+def test_session_token_is_rejected_in_the_query(api):
+    async def check():
+        session_token = api.headers["Authorization"].removeprefix("Bearer ")
+        async with api as client:
+            del client.headers["Authorization"]
+            response = await client.get("/events", params={"token": session_token})
+            assert response.status_code == 401
+            response = await client.get("/events")
+            assert response.status_code == 403
+
+    asyncio.run(check())
+
+
+def test_stream_delivers_published_events(user, monkeypatch):
+    monkeypatch.setattr(server, "event_hub", server.EventHub(2))
+
+    async def check():
+        response = await server.stream_events(user)
+        stream = response.body_iterator
+        try:
+            assert await anext(stream) == "retry: 5000\n\n"
+            server.publish_change(user.id, "clients", "created", {"_id": "x", "id": "c1", "name": "Олена"})
+            assert await anext(stream) == (
+                'data: {"collection":"clients","action":"created","id":"c1",'
+                '"document":{"id":"c1","name":"Олена"}}\n\n'
+            )
+        finally:
+            await stream.aclose()
+        assert server.event_hub.stats()["streams"] == 0
+
+    asyncio.run(check())
+
+
+def test_slow_stream_gets_resync_instead_of_backlog():
+    hub = server.EventHub(2)
+    queue = hub.subscribe("u")
+    for index in range(3):
+        hub.publish("u", {"collection": "clients", "action": "updated", "id": str(index)})
+    assert queue.get_nowait() == {"action": "resync"}
+    assert queue.empty()
+
+
+@pytest.mark.parametrize("error", [PyMongoError("stream closed"), RuntimeError("bug")])
+def test_watcher_hands_events_back_to_the_process_when_it_stops(error, monkeypatch):
+    monkeypatch.setattr(server, "event_hub", server.EventHub(2))
+
+    async def check():
+        task = asyncio.create_task(server.watch_changes(FailingDatabase(error)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises((asyncio.CancelledError, RuntimeError)):
+            await task
+        assert server.event_hub.external is False
+
+    asyncio.run(check())
@@ -0,0 +1,124 @@
+"""
+Bulk import tests. File parsing needs no database; the bulk upserts run
+against mongomock.
+"""
+
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from openpyxl import Workbook
+
+import server
+
+
+def upload(filename: str, content: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+def test_csv_rows_sniff_delimiter_and_decimal_commas():
+    content = "\ufeffname;unit;price\nБорошно;кг;25,5\n;;\nЦукор; кг ;\n".encode()
+    rows = list(server.iter_import_rows(upload("ingredients.csv", content)))
+    assert rows == [
+        (2, {"name": "Борошно", "unit": "кг", "price": "25.5"}),
+        (4, {"name": "Цукор", "unit": "кг"}),
+    ]
+
+
+def test_xlsx_rows_are_read_as_text():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["name", "unit", "price", None])
+    sheet.append(["Масло", "кг", 320.0, "ignored"])
+    sheet.append(["Ваніль", None, 12.75])
+    content = io.BytesIO()
+    workbook.save(content)
+
+    rows = list(server.iter_import_rows(upload("ingredients.xlsx", content.getvalue())))
+    assert rows == [
+        (2, {"name": "Масло", "unit": "кг", "price": "320"}),
+        (3, {"name": "Ваніль", "price": "12.75"}),
+    ]
+
+
+def test_unsupported_import_file_type():
+    with pytest.raises(HTTPException) as error:
+        list(server.iter_import_rows(upload("ingredients.txt", b"name\n")))
+    assert error.value.status_code == 400
+
+
+def test_bulk_upsert_creates_updates_and_reports_rows(mock_db):
+    async def check(database):
+        await database.clients.insert_one(server.with_search_keys("clients", {
+            "id": "c1", "userId": "u", "name": "Олена", "email": "olena@example.com", "phone": "0671234567",
+        }))
+        renamed = []
+        results = await server.bulk_upsert_chunk("u", "clients", [
+            (2, {"id": "c1", "name": "Олена Петренко"}),
+            (3, {"name": "Іван"}),
+            (4, {"name": "Іван", "phone": "0501112233"}),
+            (5, {"id": "missing", "name": "Хтось"}),
+            (6, {"email": "no-name@example.com"}),
+        ], renamed)
+
+        assert [(result["row"], result["status"]) for result in results] == [
+            (2, "updated"), (3, "duplicate"), (4, "created"), (5, "error"), (6, "error"),
+        ]
+        assert renamed == ["c1"]
+
+        # Columns missing from the row keep their stored values
+        updated = await database.clients.find_one({"id": "c1"})
+        assert updated["email"] == "olena@example.com"
+        assert updated["phone"] == "0671234567"
+        assert "петренко" in updated["searchKeys"]
+
+        created = await database.clients.find_one({"name": "Іван"})
+        assert created["id"] == results[2]["id"]
+        assert created["phone"] == "0501112233"
+        assert "0501112233" in created["searchKeys"]
+
+    asyncio.run(check(mock_db))
+
+
+def test_bulk_upsert_matches_existing_names(mock_db):
+    async def check(database):
+        await database.ingredients.insert_one({"id": "i1", "userId": "u", "name": "Цукор", "unit": "кг", "price": 30.0})
+        results = await server.bulk_upsert_chunk("u", "ingredients", [(2, {"name": "Цукор", "unit": "кг", "price": "32.5"})])
+
+        assert results == [{"row": 2, "status": "updated", "id": "i1"}]
+        assert await database.ingredients.count_documents({"userId": "u"}) == 1
+        assert (await database.ingredients.find_one({"id": "i1"}))["price"] == 32.5
+
+    asyncio.run(check(mock_db))
+
+
+def test_bulk_upsert_updates_ingredient_price_by_id(mock_db):
+    async def check(database):
+        await database.ingredients.insert_one({"id": "i1", "userId": "u", "name": "Борошно", "unit": "кг", "price": 20.0})
+        results = await server.bulk_upsert_chunk("u", "ingredients", [(2, {"id": "i1", "price": 5})])
+
+        assert results == [{"row": 2, "status": "updated", "id": "i1"}]
+        stored = await database.ingredients.find_one({"id": "i1"}, {"_id": 0, "searchKeys": 0})
+        assert stored == {"id": "i1", "userId": "u", "name": "Борошно", "unit": "кг", "price": 5.0}
+
+    asyncio.run(check(mock_db))
+
+
+def test_bulk_upsert_updates_ingredient_price_by_name(mock_db):
+    async def check(database):
+        await database.ingredients.insert_one({"id": "i1", "userId": "u", "name": "Борошно", "unit": "кг", "price": 20.0})
+        results = await server.bulk_upsert_chunk("u", "ingredients", [
+            (2, {"name": "Борошно", "price": 3}),
+            (3, {"name": "Сіль", "price": 1}),
+        ])
+
+        assert results[0] == {"row": 2, "status": "updated", "id": "i1"}
+        # New documents still need every required column
+        assert results[1]["status"] == "error"
+        assert results[1]["error"] == "unit: Field required"
+        stored = await database.ingredients.find_one({"id": "i1"})
+        assert (stored["unit"], stored["price"]) == ("кг", 3.0)
+        assert await database.ingredients.count_documents({"userId": "u"}) == 1
+
+    asyncio.run(check(mock_db))
@@ -0,0 +1,228 @@
+"""
+Migration and index bootstrap tests. They run against MongoDB at MONGO_URL
+(default mongodb://localhost:27017) when it is reachable and against
+mongomock otherwise; query plan checks need the real server.
+"""
+
+import asyncio
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+import server
+from tests.conftest import mock_is_replica_set
+
+
+def mongo_available() -> bool:
+    try:
+        MongoClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=500).admin.command("ping")
+        return True
+    except ServerSelectionTimeoutError:
+        return False
+
+
+MONGO_AVAILABLE = mongo_available()
+requires_mongo = pytest.mark.skipif(not MONGO_AVAILABLE, reason="MongoDB is not reachable")
+
+
+def index_names(plan: dict) -> set:
+    """Collect the index names used by IXSCAN stages of a query plan."""
+    names = set()
+    if plan.get("stage") == "IXSCAN":
+        names.add(plan["indexName"])
+    for key in ("inputStage", "outerStage", "innerStage"):
+        if key in plan:
+            names |= index_names(plan[key])
+    for child in plan.get("inputStages", []):
+        names |= index_names(child)
+    return names
+
+
+async def winning_indexes(cursor) -> set:
+    explain = await cursor.explain()
+    return index_names(explain["queryPlanner"]["winningPlan"])
+
+
+def run_with_database(test):
+    async def runner():
+        if MONGO_AVAILABLE:
+            mongo = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        else:
+            mongo = pytest.importorskip("mongomock_motor").AsyncMongoMockClient()
+        database = mongo[f"cake_bb_test_{uuid.uuid4().hex}"]
+        try:
+            await test(database)
+        finally:
+            await mongo.drop_database(database.name)
+            mongo.close()
+
+    if MONGO_AVAILABLE:
+        asyncio.run(runner())
+    else:
+        with mock.patch.object(server, "is_replica_set", mock_is_replica_set):
+            asyncio.run(runner())
+
+
+def test_migrations_are_idempotent():
+    async def check(database):
+        assert await server.run_migrations(database) == [version for version, _, _ in server.MIGRATIONS]
+        assert await server.run_migrations(database) == []
+
+        # Re-running a recorded migration must not fail either
+        for _, _, migration in server.MIGRATIONS:
+            await migration(database)
+
+    run_with_database(check)
+
+
+@requires_mongo
+def test_keyset_migration_tolerates_concurrent_index_drops():
+    async def check(database):
+        await server.migration_001_indexes(database)
+        # Both workers may see the old index before either drops it
+        await asyncio.gather(*(server.migration_003_keyset_indexes(database) for _ in range(4)))
+        assert "userId_dueDate" not in await database.orders.index_information()
+
+    run_with_database(check)
+
+
+@requires_mongo
+def test_user_scoped_lookups_use_indexes():
+    async def check(database):
+        await server.run_migrations(database)
+        user_id = str(uuid.uuid4())
+        for collection in server.USER_SCOPED_COLLECTIONS:
+            await database[collection].insert_one({"id": str(uuid.uuid4()), "userId": user_id})
+            cursor = database[collection].find({"id": "missing", "userId": user_id})
+            assert "userId_id" in await winning_indexes(cursor), collection
+
+    run_with_database(check)
+
+
+@requires_mongo
+def test_order_queries_use_indexes():
+    async def check(database):
+        await server.run_migrations(database)
+        user_id = str(uuid.uuid4())
+        await database.orders.insert_one({
+            "id": str(uuid.uuid4()),
+            "userId": user_id,
+            "status": "New",
+            "dueDate": "2026-01-01",
+            "createdAt": "2026-01-01T00:00:00+00:00",
+        })
+
+        by_due_date = database.orders.find({"userId": user_id}).sort([("dueDate", -1), ("id", -1)])
+        assert "userId_dueDate_id" in await winning_indexes(by_due_date)
+
+        indexes = await database.orders.index_information()
+        assert "userId_dueDate" not in indexes
+
+        by_status = database.orders.find(
+            {"userId": user_id, "status": {"$in": ["New", "In Progress"]}, "createdAt": {"$gte": "2025"}}
+        )
+        assert "userId_status_createdAt" in await winning_indexes(by_status)
+
+    run_with_database(check)
+
+
+@requires_mongo
+def test_dashboard_queries_use_indexes():
+    async def check(database):
+        await server.run_migrations(database)
+        user_id = str(uuid.uuid4())
+        await database.orders.insert_one({
+            "id": str(uuid.uuid4()), "userId": user_id, "status": "New",
+            "dueDate": "2026-01-01", "createdAt": "2026-01-01T00:00:00+00:00",
+        })
+
+        upcoming = database.orders.find(
+            {"userId": user_id, "status": {"$nin": ["Delivered", "Cancelled"]}}
+        ).sort([("dueDate", 1), ("id", 1)]).limit(5)
+        assert "userId_dueDate_id" in await winning_indexes(upcoming)
+        active = database.orders.find({"userId": user_id, "status": {"$in": ["New", "In Progress"]}})
+        assert "userId_status_createdAt" in await winning_indexes(active)
+        recent = database.orders.find({"userId": user_id, "createdAt": {"$gte": "2025-12-25"}})
+        assert await winning_indexes(recent) & {"userId_createdAt_id", "userId_status_createdAt"}
+
+    run_with_database(check)
+
+
+@requires_mongo
+def test_list_pages_sort_on_indexes():
+    async def check(database):
+        await server.run_migrations(database)
+        user_id = str(uuid.uuid4())
+        for collection in ("ingredients", "recipes", "semifinished", "categories", "clients"):
+            await database[collection].insert_one({"id": str(uuid.uuid4()), "userId": user_id, "name": "a"})
+            page = database[collection].find(
+                {"userId": user_id, "$or": [{"name": {"$gt": "a"}}, {"name": "a", "id": {"$gt": ""}}]}
+            ).sort([("name", 1), ("id", 1)]).limit(51)
+            assert "userId_name_id" in await winning_indexes(page), collection
+
+    run_with_database(check)
+
+
+@requires_mongo
+def test_auth_lookups_use_indexes():
+    async def check(database):
+        await server.run_migrations(database)
+        await database.users.insert_one({"id": str(uuid.uuid4()), "email": "a@example.com"})
+        await database.password_resets.insert_one({
+            "email": "a@example.com",
+            "code": "123456",
+            "expiresAt": datetime.now(timezone.utc),
+        })
+
+        assert "email_unique" in await winning_indexes(database.users.find({"email": "a@example.com"}))
+        assert "email_code" in await winning_indexes(
+            database.password_resets.find({"email": "a@example.com", "code": "123456"})
+        )
+
+        indexes = await database.password_resets.index_information()
+        assert indexes["expiresAt_ttl"]["expireAfterSeconds"] == 0
+
+    run_with_database(check)
+
+
+def test_daily_stats_rollups_use_index():
+    async def check(database):
+        user_id = str(uuid.uuid4())
+        await database.orders.insert_many([
+            {"id": str(uuid.uuid4()), "userId": user_id, "clientId": "c1", "status": status, "total": 10.0,
+             "createdAt": "2026-01-01T10:00:00+00:00"}
+            for status in ("New", "Delivered", "Delivered")
+        ])
+        await server.run_migrations(database)
+
+        rollup = await database.daily_stats.find_one({"userId": user_id, "day": "2026-01-01"})
+        assert rollup["count"] == 3
+        assert rollup["statuses"]["Delivered"] == {"count": 2, "total": 20.0}
+
+        if MONGO_AVAILABLE:
+            by_day = database.daily_stats.find({"userId": user_id, "day": {"$gte": "2026-01-01", "$lte": "2026-01-31"}})
+            assert "userId_day" in await winning_indexes(by_day)
+
+    run_with_database(check)
+
+
+def test_search_uses_prefix_index():
+    async def check(database):
+        await server.run_migrations(database)
+        user_id = str(uuid.uuid4())
+        for collection in server.SEARCH_FIELDS:
+            document = server.with_search_keys(collection, {"id": str(uuid.uuid4()), "userId": user_id, "name": "Торт Наполеон"})
+            await database[collection].insert_one(document)
+            query = {"userId": user_id, "$and": [{"searchKeys": re.compile("^напол")}]}
+            if MONGO_AVAILABLE:
+                assert "userId_searchKeys" in await winning_indexes(database[collection].find(query)), collection
+            assert await database[collection].find(query).to_list(None)
+
+    run_with_database(check)
@@ -0,0 +1,48 @@
+"""
+Request metrics tests against a small app wrapped in MetricsMiddleware;
+MongoDB commands are reported to the metrics directly, as the command
+listener would.
+"""
+
+import asyncio
+
+import httpx
+from fastapi import BackgroundTasks, FastAPI
+
+import server
+
+
+def test_request_metrics_are_per_route_and_exclude_background_tasks(monkeypatch):
+    metrics = server.Metrics()
+    monkeypatch.setattr(server, "metrics", metrics)
+    app = FastAPI()
+    app.add_middleware(server.MetricsMiddleware)
+    seen_in_flight = []
+
+    def background_command():
+        metrics.observe_command("update", 0.5, failed=False)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: str, background_tasks: BackgroundTasks):
+        seen_in_flight.append(dict(metrics.in_flight))
+        metrics.observe_command("find", 0.25, failed=False)
+        background_tasks.add_task(background_command)
+        return {"id": item_id}
+
+    async def check():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            assert (await client.get("/items/1")).status_code == 200
+            assert (await client.get("/missing")).status_code == 404
+
+    asyncio.run(check())
+
+    route = ("GET", "/items/{item_id}")
+    assert seen_in_flight == [{route: 1}]
+    assert metrics.in_flight == {route: 0, ("GET", "unmatched"): 0}
+    assert metrics.requests[("GET", "/items/{item_id}", 200)] == 1
+    assert metrics.requests[("GET", "unmatched", 404)] == 1
+    # The background update still counts for MongoDB but not for the route
+    assert metrics.request_commands[route].sum == 1
+    assert metrics.request_mongo_seconds[route] == 0.25
+    assert metrics.commands[("update", "succeeded")] == 1
+    assert 'http_requests_in_flight{method="GET",route="/items/{item_id}"} 0' in metrics.render()
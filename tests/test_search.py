@@ -0,0 +1,47 @@
+"""
+Search key and search ranking tests, run against mongomock.
+"""
+
+import asyncio
+
+import server
+
+
+def test_search_keys_normalise_words():
+    keys = server.search_keys("recipes", {"name": "М'ятний  Торт", "description": "Зі свіжою ЁЛКОЮ"})
+    assert keys == sorted({"=мятний торт", "мятний", "торт", "зі", "свіжою", "елкою"})
+
+
+def test_search_keys_for_contacts():
+    keys = server.search_keys("clients", {"name": "Ann O’Neil", "email": "Ann@Example.com", "phone": "+380 67 123 45 67"})
+    assert {"=ann oneil", "ann", "oneil", "ann@example.com", "example", "com"} <= set(keys)
+    assert {"380671234567", "0671234567"} <= set(keys)
+
+
+def test_search_keys_skip_empty_fields():
+    assert server.search_keys("clients", {"name": "Ірина", "email": None, "phone": ""}) == ["=ірина", "ірина"]
+
+
+def test_search_finds_exact_name_among_many_prefix_matches(mock_db, monkeypatch):
+    monkeypatch.setattr(server, "SEARCH_CANDIDATES", 50)
+    user = server.User(name="Test", email="test@example.com")
+
+    async def check(database):
+        await database.ingredients.insert_many([
+            server.with_search_keys("ingredients", {"id": f"i{number}", "userId": user.id, "name": f"Борошно пшеничне {number}"})
+            for number in range(250)
+        ])
+        await database.ingredients.insert_one(server.with_search_keys("ingredients", {"id": "plain", "userId": user.id, "name": "Борошно"}))
+        await database.ingredients.insert_one(server.with_search_keys("ingredients", {"id": "rye", "userId": user.id, "name": "Житнє борошно"}))
+
+        results = await server.search(q="БОРОШНО", types="ingredients", limit=3, current_user=user)
+        assert [result["id"] for result in results][:1] == ["plain"]
+        assert len(results) == 3
+
+        results = await server.search(q="борошно пш", types="ingredients", limit=2, current_user=user)
+        assert all(result["name"].startswith("Борошно пшеничне") for result in results)
+
+        results = await server.search(q="житн", types="ingredients", limit=5, current_user=user)
+        assert [result["id"] for result in results] == ["rye"]
+
+    asyncio.run(check(mock_db))
@@ -0,0 +1,110 @@
+"""
+Upload tests: streaming size limits, content-addressed storage and
+thumbnails, run against mongomock.
+"""
+
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+import server
+
+BOUNDARY = "test-boundary"
+
+
+def multipart(content: bytes, field: str = "file", filename: str = "photo.png") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+HEADERS = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+
+@pytest.fixture
+def uploads_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "UPLOADS_DIR", tmp_path)
+    return tmp_path
+
+
+def test_identical_uploads_are_stored_once(api, uploads_dir):
+    async def check():
+        async with api as client:
+            first = await client.post("/upload/avatar", content=multipart(b"same bytes"), headers=HEADERS)
+            second = await client.post("/upload/avatar", content=multipart(b"same bytes", filename="copy.PNG"), headers=HEADERS)
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json()
+        assert [path.name for path in uploads_dir.iterdir()] == [first.json()["avatarUrl"].rsplit("/", 1)[1]]
+        assert (uploads_dir / first.json()["avatarUrl"].rsplit("/", 1)[1]).read_bytes() == b"same bytes"
+
+    asyncio.run(check())
+
+
+def test_declared_oversized_upload_is_refused_before_reading(api, uploads_dir, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_MAX_BYTES", 1000)
+    monkeypatch.setattr(server, "UPLOAD_FORM_OVERHEAD_BYTES", 100)
+
+    async def check():
+        async with api as client:
+            response = await client.post("/upload/avatar", content=multipart(b"x" * 5000), headers=HEADERS)
+        assert response.status_code == 413
+        assert list(uploads_dir.iterdir()) == []
+
+    asyncio.run(check())
+
+
+def test_streamed_oversized_upload_is_cut_off(api, uploads_dir, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_MAX_BYTES", 1000)
+    sent = []
+
+    async def chunked_body():
+        # No Content-Length: only the running count can stop it
+        body = multipart(b"x" * 100_000)
+        for start in range(0, len(body), 500):
+            sent.append(start)
+            yield body[start:start + 500]
+
+    async def check():
+        async with api as client:
+            response = await client.post("/upload/avatar", content=chunked_body(), headers=HEADERS)
+        assert response.status_code == 413
+        # Refused within the first few KB, not after the whole body
+        assert len(sent) < 10
+        assert list(uploads_dir.iterdir()) == []
+
+    asyncio.run(check())
+
+
+def test_upload_without_file_field(api, uploads_dir):
+    async def check():
+        async with api as client:
+            response = await client.post("/upload/avatar", content=multipart(b"data", field="other"), headers=HEADERS)
+            not_multipart = await client.post("/upload/avatar", content=b"data", headers={"Content-Type": "image/png"})
+        assert response.status_code == 400
+        assert not_multipart.status_code == 400
+        assert list(uploads_dir.iterdir()) == []
+
+    asyncio.run(check())
+
+
+def test_recipe_image_upload_renders_thumbnails(api, uploads_dir, monkeypatch):
+    monkeypatch.setattr(server.app.state, "thumbnail_executor", ThreadPoolExecutor(1), raising=False)
+    image = io.BytesIO()
+    Image.new("RGB", (800, 600), "pink").save(image, "PNG")
+
+    async def check():
+        async with api as client:
+            response = await client.post("/upload/recipe", content=multipart(image.getvalue()), headers=HEADERS)
+        assert response.status_code == 200
+        body = response.json()
+        digest = body["imageUrl"].rsplit("/", 1)[1].split(".")[0]
+        assert body["thumbnails"] == {str(size): f"/uploads/{digest}_{size}.webp" for size in server.THUMBNAIL_SIZES}
+        with Image.open(uploads_dir / f"{digest}_200.webp") as thumbnail:
+            assert max(thumbnail.size) == 200
+
+    asyncio.run(check())